@@ -19,7 +19,8 @@ def on_loaded(win: webview.Window):
 
 if __name__ == "__main__":
     print("[main] Creating API and window…")
-    api = CrossPrintAPI()
+    # Warps run in worker processes on shared-memory buffers, off the UI bridge thread
+    api = CrossPrintAPI(worker_processes=2)
 
     window = webview.create_window(
         title="crossPrint",
@@ -1,33 +1,74 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional, Tuple
+import atexit
 import base64
 from io import BytesIO
 
 import webview
 from webview import FileDialog
+import numpy as np
 from PIL import Image
 
-from .image_store import ImageStore
+from .disk_cache import DiskCache, content_key
+from .image_store import ImageStore, ImageEntry
+from .shared_images import SharedImage, SharedOpPool
+from .watcher import InputWatcher
 from .image_ops import (
     enforce_exif_orientation,
     warp_projective_full_canvas,
+    warp_projective_to_square,
+    square_side_for_quad,
+    clamp_crop_rect,
     crop_axis_aligned,
+    to_grayscale,
     threshold_global,
-    threshold_otsu,
+    threshold_adaptive,
+    otsu_value,
+    gray_histogram,
+    otsu_from_histogram,
+    threshold_sweep_planes,
+    ink_fractions,
     export_png,
 )
 
+THRESHOLD_METHODS = ("global", "otsu", "adaptive")
+SWEEP_MAX_VALUES = 64
+SWEEP_THUMB_EDGE_RANGE = (32, 1024)
+
 
 class CrossPrintAPI:
     """Expose image operations to the UI via a simple Python API."""
 
-    def __init__(self):
-        """Initialize image store and window state."""
+    def __init__(self, cache_dir: Path | None = None, cache_max_bytes: int = 2 << 30, worker_processes: int = 0):
+        """Initialize image store, on-disk result cache (./cache by default), and window state.
+
+        With `worker_processes` > 0, warps run in a process pool on shared-memory buffers.
+        """
         self.store = ImageStore()
+        script_home = Path(__file__).resolve().parent.parent
+        self._input_dir = script_home / "input"
+        self._cache = DiskCache(cache_dir or script_home / "cache", cache_max_bytes)
+        self._watcher: InputWatcher | None = None
+        self._pool = SharedOpPool(worker_processes) if worker_processes > 0 else None
+        atexit.register(self.shutdown)
         self.last_output_dir: Path | None = None
         self.window: webview.Window | None = None
 
+    def shutdown(self) -> None:
+        """Stop background workers and release shared-memory buffers."""
+        if self._watcher:
+            self._watcher.stop()
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+        self.store.close_all()
+
+    def close_image(self, image_id: int) -> Dict[str, Any]:
+        """Drop an image from the store, freeing its memory and shared buffer."""
+        self.store.close(image_id)
+        return {"closed": image_id}
+
     def set_window(self, window: webview.Window) -> None:
         """Bind the API to a webview window."""
         self.window = window
@@ -36,47 +77,108 @@ class CrossPrintAPI:
         """Open a file dialog anchored at ./input and return the selected path."""
         if not self.window:
             return None
-        script_home = Path(__file__).resolve().parent.parent
-        input_dir = script_home / "input"
-        input_dir.mkdir(exist_ok=True)
+        self._input_dir.mkdir(exist_ok=True)
         result = self.window.create_file_dialog(
             FileDialog.OPEN,
-            directory=str(input_dir),
+            directory=str(self._input_dir),
             allow_multiple=False,
             file_types=("Image files (*.png;*.jpg;*.jpeg)",),
         )
         return result[0] if result else None
 
+    def _decode_cached(
+        self, data: bytes, warm_only: bool = False
+    ) -> Optional[Tuple[str, Image.Image, Image.Image, float]]:
+        """Return (digest, capped image, preview, scale) for encoded bytes, reusing the cached preview by content hash.
+
+        Only the preview is cached: re-decoding the file is cheap next to building the
+        preview. With warm_only, nothing is decoded once the preview is cached (returns None).
+        """
+        digest = content_key("decode", data, self.store.full_cap_long_edge, self.store.preview_long_edge)
+        hit = self._cache.get(digest, full=False)
+        if hit and warm_only:
+            return None
+        im = enforce_exif_orientation(Image.open(BytesIO(data)))
+        if hit:
+            _im, preview, scale = hit
+            return digest, self.store.capped(im), preview, scale
+        im, preview, scale = self.store.prepare(im)
+        self._cache.put(digest, preview, scale)
+        return digest, im, preview, scale
+
+    def _create_from_bytes(self, data: bytes) -> Dict[str, Any]:
+        """Decode encoded image bytes (or reuse the disk cache) and add them to the store."""
+        digest, im, preview, scale = self._decode_cached(data)
+        iid, entry = self.store.create(im, derived=(preview, scale), digest=digest)
+        entry.threshold_base = None
+        return {"image_id": iid, "meta": self.store.meta(iid)}
+
+    def _update_cached(
+        self,
+        image_id: int,
+        digest: str | None,
+        compute: Callable[[], Tuple[Image.Image, Optional[Tuple[Image.Image, float]], Optional[SharedImage]]],
+    ) -> ImageEntry:
+        """Replace an image with the cached result for digest, else compute() -> (image, derived, shared) and cache it.
+
+        Used for stages worth a full-res cache entry (warps); cheap stages just chain the digest.
+        """
+        hit = self._cache.get(digest) if digest else None
+        if hit and hit[0] is not None:
+            im, preview, scale = hit
+            return self.store.update(image_id, im, derived=(preview, scale), digest=digest)
+        new_im, derived, shared = compute()
+        entry = self.store.update(image_id, new_im, derived=derived, digest=digest, shared=shared)
+        if digest:
+            self._cache.put(digest, entry.preview, entry.scale, entry.original)
+        return entry
+
     def load_image(self, file_path: str) -> Dict[str, Any]:
         """Load an image from disk, normalize EXIF, and add it to the store."""
         path = Path(file_path)
-        im = Image.open(path)
-        im = enforce_exif_orientation(im)
-        iid, entry = self.store.create(im)
-        entry.threshold_base = None
-        return {"image_id": iid, "meta": self.store.meta(iid)}
+        result = self._create_from_bytes(path.read_bytes())
+        if self._watcher:
+            self._watcher.mark_opened(path)
+        return result
+
+    def start_watch(self, include_existing: bool = False) -> Dict[str, Any]:
+        """Watch ./input for new images, pre-decoding them into the disk cache as they settle."""
+        if self._watcher is None:
+            self._watcher = InputWatcher(
+                self._input_dir,
+                lambda p: self._decode_cached(p.read_bytes(), warm_only=True),
+                include_existing=include_existing,
+            )
+        self._watcher.start()
+        return {"input_dir": str(self._input_dir), "workers": self._watcher.workers}
+
+    def stop_watch(self) -> Dict[str, Any]:
+        """Stop watching ./input; the review queue is kept until watching restarts."""
+        if self._watcher:
+            self._watcher.stop()
+        return {"watching": False}
+
+    def get_watch_queue(self) -> Dict[str, Any]:
+        """Return watch state and incoming files awaiting review, oldest first."""
+        if self._watcher is None:
+            return {"watching": False, "items": []}
+        return {"watching": self._watcher.running, "items": self._watcher.items()}
 
     def load_image_data(self, data_url: str) -> Dict[str, Any]:
         """Load an image from a data URL, normalize EXIF, and add it to the store."""
         if "," not in data_url:
             raise ValueError("Invalid data URL")
         _header, b64 = data_url.split(",", 1)
-        data = base64.b64decode(b64)
-        im = Image.open(BytesIO(data))
-        im = enforce_exif_orientation(im)
-        iid, entry = self.store.create(im)
-        entry.threshold_base = None
-        return {"image_id": iid, "meta": self.store.meta(iid)}
+        return self._create_from_bytes(base64.b64decode(b64))
 
 
     def load_image_from_bytes(self, filename: str, data: list[int]) -> Dict[str, Any]:
         """Register image bytes from frontend and return image_id for preview/export."""
-        buf = BytesIO(bytes(data))
-        im = Image.open(buf)
-        im = enforce_exif_orientation(im)
-        iid, entry = self.store.create(im)
-        entry.threshold_base = None
-        return {"image_id": iid, "meta": self.store.meta(iid)}
+        return self.load_image_bytes(bytes(data))
+
+    def load_image_bytes(self, data: bytes) -> Dict[str, Any]:
+        """Load encoded image bytes (e.g. an upload), normalize EXIF, and add them to the store."""
+        return self._create_from_bytes(data)
 
 
 
@@ -86,14 +188,86 @@ class CrossPrintAPI:
         b64 = base64.b64encode(data).decode("ascii")
         return f"data:image/png;base64,{b64}"
 
+    def get_pyramid_info(self, image_id: int) -> Dict[str, Any]:
+        """Return pyramid level sizes and tile grid for zoom-dependent tile requests."""
+        return self.store.pyramid_meta(image_id)
+
+    def get_tile_png(self, image_id: int, level: int, col: int, row: int) -> str:
+        """Return one pyramid tile as a data URL (PNG)."""
+        data = self.store.to_bytes_tile(image_id, int(level), int(col), int(row))
+        b64 = base64.b64encode(data).decode("ascii")
+        return f"data:image/png;base64,{b64}"
+
+    def _run_warp(self, image_id: int, op: str, quad_full, out_size: Tuple[int, int], local_fn, **kwargs):
+        """Run a warp in the process pool on shared buffers when available, else in this thread.
+
+        Returns (image, None, shared) for _update_cached. For L/RGBA the image is a view
+        over the result buffer, which becomes the entry's backing, so the next warp reads
+        it in place. RGB cannot be mapped without a copy, so its result is copied out and
+        the buffer released rather than holding the pixels twice.
+        """
+        src = self.store.shared(image_id) if self._pool else None
+        if src is None:
+            return local_fn(self.store.get(image_id).original, quad_full, **kwargs), None, None
+        dst = self._pool.run(op, src, out_size, quad_full, **kwargs)
+        if dst.mappable:
+            return dst.to_pil(), None, dst
+        try:
+            return dst.to_pil(), None, None
+        finally:
+            dst.release()
+
     def apply_homography(self, image_id: int, points_preview: List[Dict[str, float]]) -> Dict[str, Any]:
         """Apply projective warp on the full canvas based on four preview-space points."""
         entry = self.store.get(image_id)
         s = entry.scale
-        import numpy as np
         quad_full = np.array([(p["x"] / s, p["y"] / s) for p in points_preview], dtype=float)
-        new_im = warp_projective_full_canvas(entry.original, quad_full)
-        self.store.update(image_id, new_im)
+        digest = content_key(entry.digest, "warp_full", np.round(quad_full, 3).tolist()) if entry.digest else None
+        self._update_cached(
+            image_id,
+            digest,
+            lambda: self._run_warp(image_id, "warp_full", quad_full, entry.original.size, warp_projective_full_canvas),
+        )
+        self.store.get(image_id).threshold_base = None
+        return {"meta": self.store.meta(image_id)}
+
+    def apply_square_warp(
+        self,
+        image_id: int,
+        points_preview: List[Dict[str, float]],
+        side_px: int | None = None,
+        dpi: float | None = None,
+        size_in: float | None = None,
+        resample: str = "area",
+    ) -> Dict[str, Any]:
+        """Warp the four preview-space points directly into a square output image.
+
+        The side is `side_px`, else `dpi * size_in` (print size), else the quad's mean edge.
+        This replaces full-canvas warp + crop with a single resampling of just the puzzle.
+        """
+        entry = self.store.get(image_id)
+        s = entry.scale
+        quad_full = np.array([(p["x"] / s, p["y"] / s) for p in points_preview], dtype=float)
+        if side_px is None and dpi and size_in:
+            side_px = int(round(float(dpi) * float(size_in)))
+        side = int(side_px) if side_px else None
+        if side is not None and not 1 <= side <= self.store.full_cap_long_edge:
+            raise ValueError(f"Square side {side}px outside 1..{self.store.full_cap_long_edge}")
+        digest = (
+            content_key(entry.digest, "warp_square", np.round(quad_full, 3).tolist(), side, resample)
+            if entry.digest else None
+        )
+        out_side = side or square_side_for_quad(quad_full)
+        if out_side > self.store.full_cap_long_edge:
+            raise ValueError(f"Square side {out_side}px exceeds {self.store.full_cap_long_edge}px")
+        self._update_cached(
+            image_id,
+            digest,
+            lambda: self._run_warp(
+                image_id, "warp_square", quad_full, (out_side, out_side), warp_projective_to_square,
+                side=side, resample=resample, max_work_side=self.store.full_cap_long_edge,
+            ),
+        )
         self.store.get(image_id).threshold_base = None
         return {"meta": self.store.meta(image_id)}
 
@@ -105,26 +279,103 @@ class CrossPrintAPI:
         t = int(rect_preview["top"] / s)
         r = int(rect_preview["right"] / s)
         b = int(rect_preview["bottom"] / s)
-        new_im = crop_axis_aligned(entry.original, (l, t, r, b))
-        self.store.update(image_id, new_im)
+        rect = clamp_crop_rect(entry.original.size, (l, t, r, b))
+        new_im = crop_axis_aligned(entry.original, rect)
+        # Crop maps onto the existing preview: slice it instead of re-downsampling.
+        # Cheap enough to redo, so only its digest is chained (no disk cache write).
+        digest = content_key(entry.digest, "crop", rect) if entry.digest else None
+        self.store.update(image_id, new_im, derived=self.store.derive_crop_preview(image_id, rect), digest=digest)
         self.store.get(image_id).threshold_base = None
         return {"meta": self.store.meta(image_id)}
 
     def apply_threshold(self, image_id: int, method: str = "global", value: int = 128) -> Dict[str, Any]:
-        """Apply global or Otsu threshold, caching a base image for iterative tweaks."""
+        """Apply global, Otsu, or adaptive threshold, caching a base image for iterative tweaks."""
+        if method not in THRESHOLD_METHODS:
+            raise ValueError(f"Unknown threshold method {method!r}; expected one of {THRESHOLD_METHODS}")
         entry = self.store.get(image_id)
         if entry.threshold_base is None:
             entry.threshold_base = entry.original.copy()
+            entry.threshold_base_preview = entry.preview
+            entry.threshold_base_digest = entry.digest
         base_im = entry.threshold_base
-        if method == "otsu":
-            new_im = threshold_otsu(base_im)
-        else:
+        base_preview = entry.threshold_base_preview
+        base_digest = entry.threshold_base_digest
+        if method == "global":
             value = int(max(0, min(255, value)))
-            new_im = threshold_global(base_im, value)
-        self.store.update(image_id, new_im)
-        self.store.get(image_id).threshold_base = base_im
+        key_value = value if method == "global" else None
+        digest = content_key(base_digest, "threshold", method, key_value) if base_digest else None
+
+        # Cheaper to recompute than to read back at full res, so only the digest is chained
+        if method == "adaptive":
+            # Block size is relative to the image, so the preview gets the same look
+            new_im, derived = threshold_adaptive(base_im), (threshold_adaptive(base_preview), entry.scale)
+        else:
+            thr = otsu_value(base_im) if method == "otsu" else value
+            # Threshold is pixel-wise: apply the same value to the base preview directly
+            new_im, derived = threshold_global(base_im, thr), (threshold_global(base_preview, thr), entry.scale)
+        updated = self.store.update(image_id, new_im, derived=derived, digest=digest)
+        updated.threshold_base = base_im
+        updated.threshold_base_preview = base_preview
+        updated.threshold_base_digest = base_digest
+        updated.sweep_cache = entry.sweep_cache
         return {"meta": self.store.meta(image_id)}
 
+    def threshold_sweep(
+        self,
+        image_id: int,
+        values: List[int] | None = None,
+        include_variants: bool = True,
+        thumb_long_edge: int = 320,
+    ) -> Dict[str, Any]:
+        """Return 1-bit thumbnails for many thresholds (plus Otsu/adaptive variants) in one call.
+
+        Works on the threshold base preview: one grayscale pass (cached per base), one
+        broadcast comparison for all values, and ink coverage read off the histogram.
+        """
+        thumb_long_edge = int(max(SWEEP_THUMB_EDGE_RANGE[0], min(SWEEP_THUMB_EDGE_RANGE[1], thumb_long_edge)))
+        if values is None:
+            values = list(range(48, 224, 16))
+        # Sorted unique values; bounded, since each one is an H x W plane plus a PNG encode
+        values = sorted({int(max(0, min(255, v))) for v in values})
+        if len(values) > SWEEP_MAX_VALUES:
+            raise ValueError(f"At most {SWEEP_MAX_VALUES} distinct sweep values (got {len(values)})")
+        entry = self.store.get(image_id)
+        base_preview = entry.threshold_base_preview if entry.threshold_base is not None else entry.preview
+        cache = entry.sweep_cache
+        if cache is None or cache[0] is not base_preview or cache[1] != thumb_long_edge:
+            gray = to_grayscale(base_preview)
+            hist = gray_histogram(np.asarray(gray))
+            thumb = gray.copy()
+            thumb.thumbnail((thumb_long_edge, thumb_long_edge), Image.Resampling.BOX)
+            cache = (base_preview, thumb_long_edge, np.asarray(thumb), hist)
+            entry.sweep_cache = cache
+        _src, _edge, plane, hist = cache
+
+        otsu = otsu_from_histogram(hist)
+        labels = [("global", v) for v in values]
+        if include_variants:
+            labels.append(("otsu", otsu))
+        planes = threshold_sweep_planes(plane, [v for _m, v in labels])
+        ink = ink_fractions(hist, [v for _m, v in labels])
+
+        thumbs = [
+            {"method": m, "value": v, "ink": round(float(f), 4), "png": self._png_data_url(Image.fromarray(p))}
+            for (m, v), p, f in zip(labels, planes, ink)
+        ]
+        if include_variants:
+            adaptive = threshold_adaptive(Image.fromarray(plane)).convert("1")
+            ink_adaptive = 1.0 - float(np.asarray(adaptive).mean())
+            thumbs.append({"method": "adaptive", "value": None, "ink": round(ink_adaptive, 4),
+                           "png": self._png_data_url(adaptive)})
+        return {"width": int(plane.shape[1]), "height": int(plane.shape[0]), "otsu": otsu, "thumbs": thumbs}
+
+    @staticmethod
+    def _png_data_url(im: Image.Image) -> str:
+        """Return an image as a PNG data URL."""
+        bio = BytesIO()
+        im.save(bio, format="PNG")
+        return "data:image/png;base64," + base64.b64encode(bio.getvalue()).decode("ascii")
+
     def export_image(self, image_id: int, out_dir: str) -> Dict[str, Any]:
         """Export the current full-resolution image as PNG to the given directory."""
         entry = self.store.get(image_id)
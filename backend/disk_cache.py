@@ -0,0 +1,162 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import hashlib
+import os
+import threading
+
+from PIL import Image
+
+# Modes written losslessly; anything else is simply not cached.
+_CACHE_MODES = {"1", "L", "LA", "I", "I;16", "F", "P", "RGB", "RGBA", "CMYK"}
+# TIFF ImageDescription tag, used to carry the preview scale.
+_TAG_DESCRIPTION = 270
+
+
+def content_key(*parts: object) -> str:
+    """Return a SHA1 hex key for the given parts (bytes hashed raw, others via repr)."""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _detached(im: Image.Image) -> Image.Image:
+    """Return a new Image sharing im's pixels (no copy) but with its own encoder state.
+
+    Pillow keeps per-instance encoder state, so two threads saving one object collide;
+    the stored images are never modified in place, so sharing the pixel core is safe.
+    """
+    im.load()
+    return im._new(im.im)
+
+
+def _nbytes(im: Image.Image) -> int:
+    """Return the approximate in-memory size of an image's pixels."""
+    return im.width * im.height * len(im.getbands())
+
+
+class DiskCache:
+    """Content-addressed on-disk cache of previews (and full-res stage outputs) with size-based LRU eviction."""
+
+    def __init__(self, root: Path, max_bytes: int = 1 << 30, max_pending_bytes: int = 512 << 20):
+        """Initialize cache directory and byte budgets; writes happen on a background thread."""
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+        self._lock = threading.Lock()
+        # Entries queued for writing, served from memory until they land on disk
+        self._pending: Dict[str, Tuple[Optional[Image.Image], Image.Image, float]] = {}
+        self._pending_bytes = 0
+        self._pending_lock = threading.Lock()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        """Return (image, preview) file paths for a key, sharded by prefix."""
+        d = self.root / key[:2]
+        return d / f"{key}.tif", d / f"{key}.preview.tif"
+
+    def get(self, key: str, full: bool = True) -> Optional[Tuple[Optional[Image.Image], Image.Image, float]]:
+        """Return cached (image, preview, scale) for a key, or None on miss or unreadable entry.
+
+        The image is None for preview-only entries, or when full is False.
+        """
+        with self._pending_lock:
+            pending = self._pending.get(key)
+        if pending:
+            im, prev, scale = pending
+            return (_detached(im) if im is not None and full else None), _detached(prev), scale
+        im_path, prev_path = self._paths(key)
+        if not prev_path.exists():
+            return None
+        try:
+            prev = Image.open(prev_path)
+            prev.load()
+            scale = float(prev.tag_v2[_TAG_DESCRIPTION])
+            im = None
+            if full and im_path.exists():
+                im = Image.open(im_path)
+                im.load()
+        except Exception:
+            return None
+        for p in (im_path, prev_path):
+            try:
+                os.utime(p)  # mark as recently used for eviction
+            except OSError:
+                pass
+        return im, prev, scale
+
+    def put(self, key: str, preview: Image.Image, scale: float, im: Optional[Image.Image] = None) -> None:
+        """Queue (preview, scale) and optionally a full-res image to be written under key.
+
+        Skipped for unsupported modes, and while queued writes already hold
+        max_pending_bytes (a dropped write only costs a recompute later).
+        """
+        images = [x for x in (im, preview) if x is not None]
+        if any(x.mode not in _CACHE_MODES for x in images):
+            return
+        size = sum(_nbytes(x) for x in images)
+        with self._pending_lock:
+            if key in self._pending:
+                return
+            if self._pending and self._pending_bytes + size > self.max_pending_bytes:
+                return
+            im = _detached(im) if im is not None else None
+            preview = _detached(preview)
+            self._pending[key] = (im, preview, scale)
+            self._pending_bytes += size
+        self._writer.submit(self._write, key, im, preview, scale, size)
+
+    def _write(self, key: str, im: Optional[Image.Image], preview: Image.Image, scale: float, size: int) -> None:
+        """Write the files atomically (scale in the preview's description tag), then evict.
+
+        Deflate TIFF: roughly 2.5x smaller than PackBits on photos and far smaller on
+        bilevel output, while still decoding faster than the work it replaces.
+        """
+        im_path, prev_path = self._paths(key)
+        im_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            jobs = [(preview, prev_path, {_TAG_DESCRIPTION: repr(scale)})]
+            if im is not None:
+                jobs.append((im, im_path, {}))
+            for img, path, tags in jobs:
+                tmp = path.with_name(path.name + ".tmp")
+                img.save(tmp, format="TIFF", compression="tiff_adobe_deflate", tiffinfo=tags)
+                os.replace(tmp, path)
+        except Exception as e:
+            print(f"[disk_cache] write failed for {key[:8]}: {e!r}")
+            return
+        finally:
+            with self._pending_lock:
+                self._pending.pop(key, None)
+                self._pending_bytes -= size
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete least-recently-used files until total size fits max_bytes."""
+        with self._lock:
+            files = []
+            total = 0
+            for p in self.root.glob("*/*.tif"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+            files.sort()
+            for _mtime, size, p in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    p.unlink()
+                    total -= size
+                except OSError:
+                    pass
+
+    def flush(self) -> None:
+        """Block until queued writes finish."""
+        self._writer.submit(lambda: None).result()
@@ -1,11 +1,11 @@
 from __future__ import annotations
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple
+from typing import Sequence, Tuple
 
 import numpy as np
 import time
-from PIL import Image, ImageOps
+from PIL import Image, ImageFilter, ImageOps
 from skimage import transform as tf
 
 
@@ -55,19 +55,57 @@ def compute_square_side_from_quad(quad: np.ndarray) -> float:
     return 0.5 * (horiz + vert)
 
 
-def warp_projective_to_square(im: Image.Image, quad_full: np.ndarray) -> Image.Image:
-    """Warp the quad region to a square image whose side equals the quad's mean edge."""
-    quad = order_quad(quad_full.astype(float))
-    side = max(1.0, compute_square_side_from_quad(quad))
+SQUARE_RESAMPLE_MODES = ("bilinear", "supersample", "area")
+
+
+def square_side_for_quad(quad_full: np.ndarray) -> int:
+    """Return the native square side (px) for an unordered quad."""
+    return max(1, int(compute_square_side_from_quad(order_quad(quad_full.astype(float)))))
+
+
+def _warp_quad_to_square(im: Image.Image, quad: np.ndarray, side: int) -> Image.Image:
+    """Bilinear-warp an ordered quad onto a side x side square."""
     dst = np.array([[0, 0], [side, 0], [side, side], [0, side]], dtype=float)
     tform = tf.ProjectiveTransform()
     if not tform.estimate(dst, quad):
         raise ValueError("Degenerate corner configuration; cannot estimate homography")
-    warped = tf.warp(np.asarray(im), tform, output_shape=(int(side), int(side)), preserve_range=True)
+    warped = tf.warp(np.asarray(im), tform, output_shape=(side, side), preserve_range=True)
     warped = np.clip(warped, 0, 255).astype(np.uint8)
     return Image.fromarray(warped if warped.ndim != 2 else warped, mode=None if warped.ndim != 2 else "L")
 
 
+def warp_projective_to_square(
+    im: Image.Image,
+    quad_full: np.ndarray,
+    side: int | None = None,
+    resample: str = "bilinear",
+    supersample: int = 2,
+    max_work_side: int | None = None,
+) -> Image.Image:
+    """Warp the quad region to a square (default side: the quad's mean edge).
+
+    resample: 'bilinear' samples once per output pixel; 'supersample' warps at
+    `supersample`x the side and box-reduces; 'area' warps at the quad's native
+    resolution and box-averages down, which only differs when shrinking.
+    `max_work_side` caps the intermediate warp side (the warp runs in float64).
+    """
+    if resample not in SQUARE_RESAMPLE_MODES:
+        raise ValueError(f"Unknown resample mode {resample!r}; expected one of {SQUARE_RESAMPLE_MODES}")
+    quad = order_quad(quad_full.astype(float))
+    native = square_side_for_quad(quad_full)
+    side = native if side is None else max(1, int(side))
+    if max_work_side is not None:
+        if side > max_work_side:
+            raise ValueError(f"Square side {side}px exceeds {max_work_side}px")
+        supersample = min(supersample, max_work_side // side)
+        native = min(native, max_work_side)
+    if resample == "supersample" and supersample > 1:
+        return _warp_quad_to_square(im, quad, side * supersample).reduce(supersample)
+    if resample == "area" and native > side:
+        return _warp_quad_to_square(im, quad, native).resize((side, side), Image.Resampling.BOX)
+    return _warp_quad_to_square(im, quad, side)
+
+
 def warp_projective_full_canvas(im: Image.Image, quad_full: np.ndarray) -> Image.Image:
     """Warp the full canvas so the selected quad becomes an axis-aligned square in place."""
     quad = order_quad(quad_full.astype(float))
@@ -93,16 +131,22 @@ def warp_projective_full_canvas(im: Image.Image, quad_full: np.ndarray) -> Image
     return Image.fromarray(warped if warped.ndim != 2 else warped, mode=None if warped.ndim != 2 else "L")
 
 
-def crop_axis_aligned(im: Image.Image, rect_full: Tuple[int, int, int, int]) -> Image.Image:
-    """Return axis-aligned crop (l, t, r, b) clamped to image bounds."""
+def clamp_crop_rect(size: Tuple[int, int], rect_full: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+    """Return crop rect (l, t, r, b) clamped to an image size; raise if too small."""
+    w, h = size
     l, t, r, b = rect_full
-    l = max(0, min(l, im.width - 1))
-    r = max(1, min(r, im.width))
-    t = max(0, min(t, im.height - 1))
-    b = max(1, min(b, im.height))
+    l = max(0, min(l, w - 1))
+    r = max(1, min(r, w))
+    t = max(0, min(t, h - 1))
+    b = max(1, min(b, h))
     if r <= l + 1 or b <= t + 1:
         raise ValueError("Crop too small or inverted")
-    return im.crop((l, t, r, b))
+    return l, t, r, b
+
+
+def crop_axis_aligned(im: Image.Image, rect_full: Tuple[int, int, int, int]) -> Image.Image:
+    """Return axis-aligned crop (l, t, r, b) clamped to image bounds."""
+    return im.crop(clamp_crop_rect(im.size, rect_full))
 
 
 def to_grayscale(im: Image.Image) -> Image.Image:
@@ -117,21 +161,73 @@ def threshold_global(im: Image.Image, thr: int) -> Image.Image:
     return Image.fromarray(out, mode="L")
 
 
+def otsu_value(im: Image.Image) -> int:
+    """Return Otsu's automatic threshold value for the image's grayscale."""
+    from skimage.filters import threshold_otsu  # local import to avoid heavy import on module load
+
+    return int(threshold_otsu(np.asarray(to_grayscale(im))))
+
+
 def threshold_otsu(im: Image.Image) -> Image.Image:
     """Return binary image using Otsu's automatic threshold."""
-    from skimage.filters import threshold_otsu  # local import to avoid heavy import on module load
+    return threshold_global(im, otsu_value(im))
 
-    arr = np.asarray(to_grayscale(im))
-    thr = int(threshold_otsu(arr))
-    out = ((arr >= thr) * 255).astype(np.uint8)
+
+def adaptive_radius(size: Tuple[int, int], block_frac: float = 1 / 16) -> float:
+    """Return the local-mean box radius for an image size (relative, so previews match full-res)."""
+    return max(1.0, max(size) * block_frac / 2)
+
+
+def threshold_adaptive(im: Image.Image, block_frac: float = 1 / 16, offset: int = 10) -> Image.Image:
+    """Return binary image thresholded against a local box-blurred mean minus offset."""
+    gray = to_grayscale(im)
+    local = gray.filter(ImageFilter.BoxBlur(adaptive_radius(gray.size, block_frac)))
+    arr = np.asarray(gray).astype(np.int16)
+    out = ((arr > np.asarray(local).astype(np.int16) - offset) * 255).astype(np.uint8)
     return Image.fromarray(out, mode="L")
 
 
+def gray_histogram(gray: np.ndarray) -> np.ndarray:
+    """Return the 256-bin histogram of a uint8 grayscale plane."""
+    return np.bincount(gray.ravel(), minlength=256)
+
+
+def otsu_from_histogram(hist: np.ndarray) -> int:
+    """Return Otsu's threshold from a 256-bin histogram (no pixel pass)."""
+    from skimage.filters import threshold_otsu  # local import to avoid heavy import on module load
+
+    return int(threshold_otsu(hist=(hist, np.arange(256))))
+
+
+def threshold_sweep_planes(gray: np.ndarray, values: Sequence[int]) -> np.ndarray:
+    """Return (N, H, W) bool planes (gray >= v) for all values in one broadcast comparison."""
+    v = np.asarray(values, dtype=np.int16).reshape(-1, 1, 1)
+    return gray[None, :, :] >= v
+
+
+def ink_fractions(hist: np.ndarray, values: Sequence[int]) -> np.ndarray:
+    """Return the fraction of pixels that turn black (< v) for each threshold, from the histogram."""
+    below = np.concatenate(([0], np.cumsum(hist)))
+    return below[np.clip(np.asarray(values, dtype=int), 0, 256)] / max(1, int(hist.sum()))
+
+
 def export_png(im: Image.Image, out_dir: Path) -> Path:
-    """Save image as PNG with timestamped name and return the path."""
+    """Save image as PNG with timestamped name and return the path.
+
+    The file is created exclusively; exports in the same second get a _2, _3, ... suffix.
+    """
     out_dir.mkdir(parents=True, exist_ok=True)
     stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     tz = tz_abbr_now()
     path = out_dir / f"puzzle_{stamp}_{tz}.png"
-    im.save(path, format="PNG")
-    return path
+    n = 1
+    while True:
+        try:
+            f = open(path, "xb")
+        except FileExistsError:
+            n += 1
+            path = out_dir / f"puzzle_{stamp}_{tz}_{n}.png"
+            continue
+        with f:
+            im.save(f, format="PNG")
+        return path
@@ -1,29 +1,58 @@
-from dataclasses import dataclass
-from typing import Dict, Tuple, Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional
 import itertools
+import math
+import threading
 
 from PIL import Image
 
+from .shared_images import SharedImage, SHAREABLE_MODES
+
 @dataclass
 class ImageEntry:
-    """Container for original image, preview, scale, and optional threshold base."""
+    """Container for original image, preview, scale, threshold base (+ preview/digest), pyramid, and content digest."""
     original: Image.Image
     preview: Image.Image
     scale: float
     threshold_base: Optional[Image.Image] = None
+    threshold_base_preview: Optional[Image.Image] = None
+    threshold_base_digest: Optional[str] = None
+    pyramid: List[Image.Image] = field(default_factory=list)
+    # Guards lazy pyramid builds for this entry only, so other images' tiles aren't blocked
+    pyramid_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    digest: Optional[str] = None
+    shared: Optional[SharedImage] = None
+    # (source preview, thumb long edge, thumb gray plane, preview histogram) for threshold sweeps
+    sweep_cache: Optional[tuple] = None
 
 
 class ImageStore:
     """Manage images with capped full-res and generated previews."""
     _ids = itertools.count(1)
 
-    def __init__(self, preview_long_edge: int = 1600, full_cap_long_edge: int = 8000):
-        """Initialize store with preview and full-res long-edge caps."""
+    def __init__(
+        self,
+        preview_long_edge: int = 1600,
+        full_cap_long_edge: int = 8000,
+        tile_size: int = 256,
+        preview_resample: Image.Resampling = Image.Resampling.LANCZOS,
+        intermediate_resample: Image.Resampling = Image.Resampling.BILINEAR,
+        min_derived_fraction: float = 0.5,
+    ):
+        """Initialize store with long-edge caps, tile size, and preview resampling options.
+
+        `intermediate_resample` is used for previews rebuilt after editing operations;
+        derived previews smaller than `min_derived_fraction` of the preview cap are rebuilt.
+        """
         self.preview_long_edge = preview_long_edge
         self.full_cap_long_edge = full_cap_long_edge
+        self.tile_size = tile_size
+        self.preview_resample = preview_resample
+        self.intermediate_resample = intermediate_resample
+        self.min_derived_fraction = min_derived_fraction
         self._images: Dict[int, ImageEntry] = {}
 
-    def _build_preview(self, im: Image.Image) -> Tuple[Image.Image, float]:
+    def _build_preview(self, im: Image.Image, resample: Optional[Image.Resampling] = None) -> Tuple[Image.Image, float]:
         """Return preview image and scale factor relative to original."""
         w, h = im.size
         long_edge = max(w, h)
@@ -31,7 +60,8 @@ class ImageStore:
         if long_edge > self.preview_long_edge:
             scale = self.preview_long_edge / long_edge
             new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
-            prev = im.resize(new_size, Image.Resampling.LANCZOS)
+            # reducing_gap box-reduces first, so the filter only runs on a ~3x larger image
+            prev = im.resize(new_size, resample or self.preview_resample, reducing_gap=3.0)
         else:
             prev = im.copy()
         return prev, scale
@@ -46,13 +76,35 @@ class ImageStore:
         new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
         return im.resize(new_size, Image.Resampling.LANCZOS)
 
-    def create(self, pil_image: Image.Image) -> Tuple[int, ImageEntry]:
-        """Add a new image and return its ID and entry."""
+    def capped(self, pil_image: Image.Image) -> Image.Image:
+        """Return the loaded image capped to full_cap_long_edge, without building a preview."""
         pil_image.load()
-        pil_image = self._cap_full_res(pil_image)
-        preview, scale = self._build_preview(pil_image)
+        return self._cap_full_res(pil_image)
+
+    def prepare(self, pil_image: Image.Image) -> Tuple[Image.Image, Image.Image, float]:
+        """Return (capped full-res, preview, scale) without registering the image."""
+        capped = self.capped(pil_image)
+        preview, scale = self._build_preview(capped)
+        return capped, preview, scale
+
+    def create(
+        self,
+        pil_image: Image.Image,
+        derived: Optional[Tuple[Image.Image, float]] = None,
+        digest: Optional[str] = None,
+    ) -> Tuple[int, ImageEntry]:
+        """Add a new image and return its ID and entry.
+
+        A `derived` (preview, scale) pair (e.g. from the disk cache) skips capping and preview
+        generation; `digest` is the content key the entry's current pixels are cached under.
+        """
+        if derived is not None:
+            pil_image.load()
+            preview, scale = derived
+        else:
+            pil_image, preview, scale = self.prepare(pil_image)
         iid = next(self._ids)
-        entry = ImageEntry(original=pil_image, preview=preview, scale=scale, threshold_base=None)
+        entry = ImageEntry(original=pil_image, preview=preview, scale=scale, threshold_base=None, digest=digest)
         self._images[iid] = entry
         return iid, entry
 
@@ -60,15 +112,81 @@ class ImageStore:
         """Return the image entry for a given ID."""
         return self._images[iid]
 
-    def update(self, iid: int, new_image: Image.Image) -> ImageEntry:
-        """Replace the image for an ID and return the updated entry."""
+    def derive_crop_preview(self, iid: int, rect_full: Tuple[int, int, int, int]) -> Optional[Tuple[Image.Image, float]]:
+        """Return (preview, scale) for a clamped full-res crop sliced from the current preview.
+
+        Returns None when the slice would be too small to stand in for a rebuilt preview.
+        """
+        e = self._images[iid]
+        s = e.scale
+        l, t, r, b = rect_full
+        size = (max(1, int((r - l) * s)), max(1, int((b - t) * s)))
+        if s >= 1.0 or max(size) < self.preview_long_edge * self.min_derived_fraction:
+            return None
+        pw, ph = e.preview.size
+        box = (l * s, t * s, min(pw, l * s + size[0]), min(ph, t * s + size[1]))
+        return e.preview.resize(size, Image.Resampling.BILINEAR, box=box), s
+
+    def update(
+        self,
+        iid: int,
+        new_image: Image.Image,
+        derived: Optional[Tuple[Image.Image, float]] = None,
+        digest: Optional[str] = None,
+        shared: Optional[SharedImage] = None,
+    ) -> ImageEntry:
+        """Replace the image for an ID and return the updated entry.
+
+        A `derived` (preview, scale) pair computed from the existing preview is reused
+        as-is; otherwise the preview is re-downsampled with the intermediate filter.
+        `shared` is a buffer already holding new_image's pixels (e.g. a worker result);
+        the previous entry's buffer is released.
+        """
         new_image.load()
-        new_image = self._cap_full_res(new_image)
-        preview, scale = self._build_preview(new_image)
-        entry = ImageEntry(original=new_image, preview=preview, scale=scale, threshold_base=None)
+        capped = self._cap_full_res(new_image)
+        if derived is not None and capped is new_image:
+            preview, scale = derived
+        else:
+            preview, scale = self._build_preview(capped, self.intermediate_resample)
+        if capped is not new_image and shared is not None:
+            shared.release()  # buffer no longer matches the stored pixels
+            shared = None
+        old = self._images.get(iid)
+        if old is not None and old.shared is not None and old.shared is not shared:
+            old.shared.release()
+        entry = ImageEntry(original=capped, preview=preview, scale=scale, threshold_base=None, digest=digest, shared=shared)
         self._images[iid] = entry
         return entry
 
+    def shared(self, iid: int) -> Optional[SharedImage]:
+        """Return the entry's shared-memory buffer for worker processes, creating it on first use.
+
+        L/RGBA entries are then re-backed by the buffer (their image becomes a view over it),
+        so the pixels are held once and later warps read them in place. RGB keeps a separate
+        copy until the next update releases it. Returns None for modes that are not plain
+        uint8 arrays.
+        """
+        e = self._images[iid]
+        if e.shared is None and e.original.mode in SHAREABLE_MODES:
+            e.shared = SharedImage.from_pil(e.original)
+            if e.shared.mappable:
+                with e.pyramid_lock:
+                    e.original = e.shared.to_pil()
+                    if e.pyramid:
+                        e.pyramid[0] = e.original
+        return e.shared
+
+    def close(self, iid: int) -> None:
+        """Drop an image and release its shared-memory buffer."""
+        e = self._images.pop(iid, None)
+        if e is not None and e.shared is not None:
+            e.shared.release()
+
+    def close_all(self) -> None:
+        """Drop every image (used at shutdown so no shared segments leak)."""
+        for iid in list(self._images):
+            self.close(iid)
+
     def to_bytes_preview(self, iid: int) -> bytes:
         """Return the PNG-encoded preview bytes for an ID."""
         from io import BytesIO
@@ -80,3 +198,55 @@ class ImageStore:
         """Return preview metadata for an ID."""
         e = self._images[iid]
         return {"width": e.preview.width, "height": e.preview.height, "scale": e.scale}
+
+    def _pyramid_sizes(self, iid: int) -> List[Tuple[int, int]]:
+        """Return (w, h) per pyramid level, halving until the long edge fits one tile."""
+        w, h = self._images[iid].original.size
+        sizes = [(w, h)]
+        while max(w, h) > self.tile_size:
+            w, h = max(1, math.ceil(w / 2)), max(1, math.ceil(h / 2))
+            sizes.append((w, h))
+        return sizes
+
+    def pyramid_level(self, iid: int, level: int) -> Image.Image:
+        """Return pyramid level (0 = full-res), building missing levels lazily from the previous one."""
+        e = self._images[iid]
+        sizes = self._pyramid_sizes(iid)
+        if not 0 <= level < len(sizes):
+            raise IndexError(f"Pyramid level {level} out of range (0..{len(sizes) - 1})")
+        with e.pyramid_lock:
+            if not e.pyramid:
+                e.pyramid.append(e.original)
+            while len(e.pyramid) <= level:
+                size = sizes[len(e.pyramid)]
+                e.pyramid.append(e.pyramid[-1].resize(size, Image.Resampling.BOX))
+            return e.pyramid[level]
+
+    def pyramid_meta(self, iid: int) -> dict:
+        """Return full-res size, tile size, and per-level grid dimensions for an ID."""
+        e = self._images[iid]
+        t = self.tile_size
+        levels = [
+            {"width": w, "height": h, "cols": math.ceil(w / t), "rows": math.ceil(h / t)}
+            for w, h in self._pyramid_sizes(iid)
+        ]
+        return {
+            "full_width": e.original.width,
+            "full_height": e.original.height,
+            "scale": e.scale,
+            "tile_size": t,
+            "levels": levels,
+        }
+
+    def to_bytes_tile(self, iid: int, level: int, col: int, row: int) -> bytes:
+        """Return the PNG-encoded tile at (col, row) of a pyramid level."""
+        from io import BytesIO
+        im = self.pyramid_level(iid, level)
+        t = self.tile_size
+        l, top = col * t, row * t
+        if col < 0 or row < 0 or l >= im.width or top >= im.height:
+            raise IndexError(f"Tile ({col}, {row}) out of range for level {level}")
+        tile = im.crop((l, top, min(l + t, im.width), min(top + t, im.height)))
+        bio = BytesIO()
+        tile.save(bio, format="PNG")
+        return bio.getvalue()
@@ -0,0 +1,403 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import argparse
+import json
+import os
+import threading
+import time
+
+from PIL import Image
+
+from .api import CrossPrintAPI
+
+
+class ServiceError(Exception):
+    """Error carrying the HTTP status to answer with."""
+
+    def __init__(self, status: HTTPStatus, message: str, retry_after: Optional[int] = None):
+        """Initialize with status, client-facing message and optional Retry-After seconds."""
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+@dataclass
+class Owned:
+    """Server-side record of an image: its owning client, a per-image lock, and last use."""
+    client: str
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class CrossPrintService:
+    """Multi-client front for one CrossPrintAPI: image ownership, quotas and concurrency limits.
+
+    Operations on one image are serialized; `max_inflight` bounds concurrent work across
+    all clients (extra requests wait up to `queue_timeout`, then get 503), and
+    `per_client` bounds one client's concurrent requests (extra ones get 429).
+    """
+
+    def __init__(
+        self,
+        api: CrossPrintAPI,
+        output_dir: Path,
+        max_inflight: int = 4,
+        per_client: int = 2,
+        queue_timeout: float = 30.0,
+        max_images_per_client: int = 16,
+        image_ttl: float = 3600.0,
+    ):
+        """Initialize limits; images idle longer than image_ttl seconds are closed by start_reaper()."""
+        self.api = api
+        self.output_dir = Path(output_dir)
+        self.per_client = per_client
+        self.queue_timeout = queue_timeout
+        self.max_images_per_client = max_images_per_client
+        self.image_ttl = image_ttl
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        self._clients: Dict[str, threading.BoundedSemaphore] = {}
+        self._owned: Dict[int, Owned] = {}
+        # Uploads still decoding, per client; counted against the image quota
+        self._reserved: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def start_reaper(self, interval: float = 60.0) -> None:
+        """Close idle images every interval seconds on a background thread."""
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.reap()
+                except Exception as e:
+                    print(f"[server] reap failed: {e!r}")
+
+        self._stop.clear()
+        self._reaper = threading.Thread(target=loop, name="image-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop(self) -> None:
+        """Stop the reaper thread."""
+        self._stop.set()
+        if self._reaper:
+            self._reaper.join()
+            self._reaper = None
+
+    def _client_slot(self, client: str) -> threading.BoundedSemaphore:
+        """Return the per-client request semaphore, creating it on first use."""
+        with self._lock:
+            sem = self._clients.get(client)
+            if sem is None:
+                sem = self._clients[client] = threading.BoundedSemaphore(self.per_client)
+            return sem
+
+    def run(self, client: str, fn, *args, **kwargs):
+        """Run fn under the client's and the global concurrency limits."""
+        slot = self._client_slot(client)
+        if not slot.acquire(blocking=False):
+            raise ServiceError(HTTPStatus.TOO_MANY_REQUESTS, "Too many concurrent requests for this client", 1)
+        try:
+            if not self._inflight.acquire(timeout=self.queue_timeout):
+                raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy; retry later", 5)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._inflight.release()
+        finally:
+            slot.release()
+
+    def owned(self, client: str, image_id: int) -> Owned:
+        """Return the ownership record, treating other clients' images as missing."""
+        with self._lock:
+            rec = self._owned.get(image_id)
+        if rec is None or rec.client != client:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"No image {image_id}")
+        rec.last_used = time.monotonic()
+        return rec
+
+    def with_image(self, client: str, image_id: int, fn, *args, **kwargs):
+        """Run fn(image_id, ...) holding the image lock, under the concurrency limits."""
+        rec = self.owned(client, image_id)
+
+        def locked():
+            with rec.lock:
+                with self._lock:
+                    current = self._owned.get(image_id)
+                if current is not rec:  # closed or reaped while waiting
+                    raise ServiceError(HTTPStatus.NOT_FOUND, f"No image {image_id}")
+                return fn(image_id, *args, **kwargs)
+
+        return self.run(client, locked)
+
+    def images(self, client: str) -> list:
+        """Return the client's image ids with preview metadata (skipping ones closed meanwhile)."""
+        with self._lock:
+            ids = [iid for iid, rec in self._owned.items() if rec.client == client]
+        out = []
+        for iid in sorted(ids):
+            try:
+                out.append({"image_id": iid, "meta": self.api.store.meta(iid)})
+            except KeyError:
+                continue
+        return out
+
+    def load(self, client: str, data: bytes) -> Dict[str, Any]:
+        """Decode uploaded bytes into a new image owned by client."""
+        with self._lock:
+            count = sum(1 for rec in self._owned.values() if rec.client == client)
+            count += self._reserved.get(client, 0)
+            if count >= self.max_images_per_client:
+                raise ServiceError(HTTPStatus.TOO_MANY_REQUESTS, "Image quota reached; DELETE an image first")
+            self._reserved[client] = self._reserved.get(client, 0) + 1  # hold the slot while decoding
+        try:
+            result = self.run(client, self.api.load_image_bytes, data)
+            with self._lock:
+                self._owned[result["image_id"]] = Owned(client)
+            return result
+        finally:
+            with self._lock:
+                self._reserved[client] -= 1
+                if not self._reserved[client]:
+                    del self._reserved[client]
+
+    def close(self, client: str, image_id: int) -> Dict[str, Any]:
+        """Close a client's image and forget its ownership."""
+        rec = self.owned(client, image_id)
+        with rec.lock:
+            with self._lock:
+                self._owned.pop(image_id, None)
+            return self.api.close_image(image_id)
+
+    def reap(self) -> None:
+        """Close images idle longer than image_ttl."""
+        cutoff = time.monotonic() - self.image_ttl
+        with self._lock:
+            stale = [(iid, rec) for iid, rec in self._owned.items() if rec.last_used < cutoff]
+        for iid, rec in stale:
+            with rec.lock:
+                with self._lock:
+                    if self._owned.get(iid) is not rec or rec.last_used >= cutoff:
+                        continue
+                    self._owned.pop(iid)
+                self.api.close_image(iid)
+
+    def full_png(self, image_id: int) -> bytes:
+        """Return the full-resolution image as PNG bytes."""
+        bio = BytesIO()
+        self.api.store.get(image_id).original.save(bio, format="PNG")
+        return bio.getvalue()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON/binary HTTP routes over CrossPrintService (clients identify via X-Client-Id).
+
+    Point and rect coordinates are in preview space, as in the UI; `meta.scale` maps
+    them to full resolution.
+    """
+
+    service: CrossPrintService
+    max_body_bytes: int = 64 << 20
+    protocol_version = "HTTP/1.1"
+
+    def _client(self) -> str:
+        """Return the caller's client id, defaulting to its address."""
+        return self.headers.get("X-Client-Id") or self.client_address[0]
+
+    def _body(self) -> bytes:
+        """Return the request body, enforcing the size limit."""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.max_body_bytes:
+            raise ServiceError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body exceeds {self.max_body_bytes} bytes")
+        return self.rfile.read(length) if length else b""
+
+    def _json(self) -> Dict[str, Any]:
+        """Return the request body parsed as a JSON object ({} when empty)."""
+        body = self._body()
+        if not body:
+            return {}
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+        if not isinstance(data, dict):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "JSON body must be an object")
+        return data
+
+    @staticmethod
+    def _number(value: Any, name: str) -> float:
+        """Return value if it is a JSON number, else raise a 400."""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"{name!r} must be a number")
+        return value
+
+    def _points(self, args: Dict[str, Any]) -> list:
+        """Return the body's four preview-space {x, y} points, validated."""
+        points = args.get("points")
+        if not isinstance(points, list) or len(points) != 4 or not all(isinstance(p, dict) for p in points):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "'points' must be four {x, y} objects")
+        return [{"x": self._number(p.get("x"), "x"), "y": self._number(p.get("y"), "y")} for p in points]
+
+    def _rect(self, args: Dict[str, Any]) -> Dict[str, float]:
+        """Return the body's preview-space crop rect, validated."""
+        return {k: self._number(args.get(k), k) for k in ("left", "top", "right", "bottom")}
+
+    def _send(self, status: HTTPStatus, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        """Write a complete response."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_json(self, data: Any, status: HTTPStatus = HTTPStatus.OK, headers: Optional[Dict[str, str]] = None) -> None:
+        """Write a JSON response."""
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def _route(self) -> Tuple[Any, str]:
+        """Dispatch the request and return (payload, content type); bytes payloads are sent raw."""
+        svc = self.service
+        client = self._client()
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        method = "GET" if self.command == "HEAD" else self.command  # _send drops the body for HEAD
+
+        if parts == ["health"] and method == "GET":
+            return {"ok": True}, "application/json"
+        if parts == ["images"]:
+            if method == "GET":
+                return {"images": svc.images(client)}, "application/json"
+            if method == "POST":
+                return svc.load(client, self._body()), "application/json"
+        if len(parts) >= 2 and parts[0] == "images":
+            try:
+                iid = int(parts[1])
+            except ValueError:
+                raise ServiceError(HTTPStatus.NOT_FOUND, f"No image {parts[1]!r}")
+            rest = parts[2:]
+            api = svc.api
+            if method == "GET":
+                if not rest:
+                    return {"image_id": iid, "meta": svc.with_image(client, iid, api.store.meta)}, "application/json"
+                if rest == ["preview.png"]:
+                    return svc.with_image(client, iid, api.store.to_bytes_preview), "image/png"
+                if rest == ["image.png"]:
+                    return svc.with_image(client, iid, svc.full_png), "image/png"
+                if rest == ["pyramid"]:
+                    return svc.with_image(client, iid, api.get_pyramid_info), "application/json"
+                if len(rest) == 4 and rest[0] == "tiles" and rest[3].endswith(".png"):
+                    level, col, row = int(rest[1]), int(rest[2]), int(rest[3][:-4])
+                    try:
+                        return svc.with_image(client, iid, api.store.to_bytes_tile, level, col, row), "image/png"
+                    except IndexError as e:
+                        raise ServiceError(HTTPStatus.NOT_FOUND, str(e))
+            if method == "DELETE" and not rest:
+                return svc.close(client, iid), "application/json"
+            if method == "POST" and len(rest) == 1:
+                args = self._json()
+                if rest[0] == "warp":
+                    points = self._points(args)
+                    if args.get("square"):
+                        return svc.with_image(
+                            client, iid, api.apply_square_warp, points,
+                            args.get("side_px"), args.get("dpi"), args.get("size_in"), args.get("resample", "area"),
+                        ), "application/json"
+                    return svc.with_image(client, iid, api.apply_homography, points), "application/json"
+                if rest[0] == "crop":
+                    return svc.with_image(client, iid, api.apply_crop, self._rect(args)), "application/json"
+                if rest[0] == "threshold":
+                    return svc.with_image(
+                        client, iid, api.apply_threshold, args.get("method", "global"), int(args.get("value", 128)),
+                    ), "application/json"
+                if rest[0] == "sweep":
+                    return svc.with_image(
+                        client, iid, api.threshold_sweep, args.get("values"), bool(args.get("include_variants", True)),
+                    ), "application/json"
+                if rest[0] == "export":
+                    # Path is server-local, so the written PNG is returned as the body too
+                    path = Path(svc.with_image(client, iid, api.export_image, str(svc.output_dir))["path"])
+                    self._extra_headers["X-Export-Path"] = str(path)
+                    return path.read_bytes(), "image/png"
+        raise ServiceError(HTTPStatus.NOT_FOUND, f"No route for {method} {self.path}")
+
+    def _error(self, status: HTTPStatus, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        """Write a JSON error and close the connection (the request body may be unread)."""
+        self.close_connection = True
+        self._send_json({"error": message}, status, {**(headers or {}), "Connection": "close"})
+
+    def _handle(self) -> None:
+        """Route the request and map failures to HTTP errors."""
+        self._extra_headers: Dict[str, str] = {}
+        try:
+            payload, content_type = self._route()
+        except ServiceError as e:
+            self._error(e.status, str(e), {"Retry-After": str(e.retry_after)} if e.retry_after else None)
+            return
+        except (ValueError, TypeError, Image.UnidentifiedImageError) as e:
+            self._error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except Exception as e:
+            print(f"[server] {self.command} {self.path} failed: {e!r}")
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal error")
+            return
+        if isinstance(payload, bytes):
+            self._send(HTTPStatus.OK, payload, content_type, self._extra_headers)
+        else:
+            self._send_json(payload, headers=self._extra_headers)
+
+    do_GET = do_POST = do_DELETE = do_HEAD = _handle
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log requests with the client id instead of stderr's default format."""
+        print(f"[server] {self._client()} {format % args}")
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    workers: int | None = None,
+    max_inflight: int | None = None,
+    per_client: int = 2,
+    max_body_mb: int = 64,
+) -> None:
+    """Run the HTTP service until interrupted."""
+    workers = max(1, (os.cpu_count() or 2) // 2) if workers is None else workers
+    api = CrossPrintAPI(worker_processes=workers)
+    service = CrossPrintService(
+        api,
+        Path(__file__).resolve().parent.parent / "output",
+        max_inflight=max_inflight or max(2, workers * 2),
+        per_client=per_client,
+    )
+    handler = type("BoundServiceHandler", (ServiceHandler,), {"service": service, "max_body_bytes": max_body_mb << 20})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    service.start_reaper()
+    print(f"[server] listening on http://{host}:{port} ({workers} warp workers, Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.stop()
+        api.shutdown()
+
+
+if __name__ == "__main__":
+    """Headless multi-client service: python -m backend.server [--host H] [--port P] [--workers N]."""
+    parser = argparse.ArgumentParser(description="CrossPrint local HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="warp worker processes (0 = in-thread)")
+    parser.add_argument("--max-inflight", type=int, default=None, help="concurrent operations across all clients")
+    parser.add_argument("--per-client", type=int, default=2, help="concurrent requests per client")
+    parser.add_argument("--max-body-mb", type=int, default=64)
+    a = parser.parse_args()
+    serve(a.host, a.port, a.workers, a.max_inflight, a.per_client, a.max_body_mb)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+import multiprocessing
+from typing import Any, Dict, List, Tuple
+import threading
+
+import numpy as np
+from PIL import Image
+
+# Modes whose np.asarray view is a plain uint8 (H, W[, C]) array.
+SHAREABLE_MODES = {"L": 1, "RGB": 3, "RGBA": 4}
+# Modes Pillow can map straight onto the buffer. RGB is stored 4 bytes per pixel
+# internally, so a packed (H, W, 3) buffer always needs a copy to become an image.
+MAPPABLE_MODES = {"L", "RGBA"}
+
+# Released segments still exported to a mapped image; closed once the image is gone.
+_lingering: List[shared_memory.SharedMemory] = []
+_lingering_lock = threading.Lock()
+
+
+def _close_lingering() -> None:
+    """Close released segments whose mapped images have since been dropped."""
+    with _lingering_lock:
+        for shm in list(_lingering):
+            try:
+                shm.close()
+            except BufferError:
+                continue
+            _lingering.remove(shm)
+
+
+def _open_segment(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without registering it for cleanup in this process."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+@dataclass(frozen=True)
+class SharedImageRef:
+    """Picklable handle to a uint8 image array living in shared memory."""
+    name: str
+    shape: Tuple[int, ...]
+    mode: str
+
+
+class SharedImage:
+    """Owner of a shared-memory pixel buffer; only the owning (bridge) process unlinks it."""
+
+    def __init__(self, shape: Tuple[int, ...], mode: str):
+        """Allocate an uninitialized uint8 buffer of the given shape."""
+        _close_lingering()
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))))
+        self.ref = SharedImageRef(self.shm.name, tuple(shape), mode)
+
+    @staticmethod
+    def shape_for(size: Tuple[int, int], mode: str) -> Tuple[int, ...]:
+        """Return the array shape for a (w, h) image in a shareable mode."""
+        w, h = size
+        c = SHAREABLE_MODES[mode]
+        return (h, w) if c == 1 else (h, w, c)
+
+    @classmethod
+    def from_pil(cls, im: Image.Image) -> "SharedImage":
+        """Copy a PIL image into a new shared buffer (the one copy on the way in)."""
+        shared = cls(cls.shape_for(im.size, im.mode), im.mode)
+        np.copyto(shared.array(), np.asarray(im))
+        return shared
+
+    def array(self) -> np.ndarray:
+        """Return a zero-copy ndarray view of the buffer."""
+        return np.ndarray(self.ref.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def mappable(self) -> bool:
+        """Return True if to_pil() is a zero-copy view over the buffer."""
+        return self.ref.mode in MAPPABLE_MODES
+
+    def to_pil(self) -> Image.Image:
+        """Return a PIL image of the buffer: a read-only view for mappable modes, else a copy."""
+        if not self.mappable:
+            return Image.fromarray(self.array().copy())
+        h, w = self.ref.shape[:2]
+        mode = self.ref.mode
+        return Image.frombuffer(mode, (w, h), self.shm.buf, "raw", mode, 0, 1)
+
+    def release(self) -> None:
+        """Unlink the segment and unmap it once no image views it; safe to call more than once."""
+        if self.shm is None:
+            return
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            self.shm.close()
+        except BufferError:  # a mapped image (or a copy-free wrapper of it) is still alive
+            with _lingering_lock:
+                _lingering.append(self.shm)
+        self.shm = None
+        _close_lingering()
+
+
+def _attached_array(ref: SharedImageRef) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Return (segment, ndarray view) for a ref in a worker process."""
+    shm = _open_segment(ref.name)
+    return shm, np.ndarray(ref.shape, dtype=np.uint8, buffer=shm.buf)
+
+
+def run_shared_op(op: str, src: SharedImageRef, dst: SharedImageRef, quad: np.ndarray, kwargs: Dict[str, Any]) -> None:
+    """Worker entry: read src, run an image_ops warp, and write the result into dst in place."""
+    from . import image_ops
+
+    src_shm, src_arr = _attached_array(src)
+    dst_shm, dst_arr = _attached_array(dst)
+    try:
+        im = Image.fromarray(src_arr)
+        if op == "warp_full":
+            out = image_ops.warp_projective_full_canvas(im, quad)
+        elif op == "warp_square":
+            out = image_ops.warp_projective_to_square(im, quad, **kwargs)
+        else:
+            raise ValueError(f"Unknown shared op {op!r}")
+        result = np.asarray(out)
+        if result.shape != dst.shape:
+            raise ValueError(f"Result shape {result.shape} does not match buffer {dst.shape}")
+        np.copyto(dst_arr, result)
+        del im, out, result
+    finally:
+        del src_arr, dst_arr
+        src_shm.close()
+        dst_shm.close()
+
+
+class SharedOpPool:
+    """Process pool that runs image_ops on shared-memory buffers instead of pickled arrays."""
+
+    def __init__(self, processes: int):
+        """Start a pool with the given number of worker processes.
+
+        Workers are spawned rather than forked: they start lazily on the first submit,
+        which happens from a request thread while other threads are running.
+        """
+        self._pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+
+    def run(self, op: str, src: SharedImage, out_size: Tuple[int, int], quad: np.ndarray, **kwargs: Any) -> SharedImage:
+        """Run op on src in a worker and return the filled result buffer (caller owns it)."""
+        dst = SharedImage(SharedImage.shape_for(out_size, src.ref.mode), src.ref.mode)
+        try:
+            self._pool.submit(run_shared_op, op, src.ref, dst.ref, quad, kwargs).result()
+        except BaseException:
+            dst.release()
+            raise
+        return dst
+
+    def shutdown(self) -> None:
+        """Stop worker processes."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import os
+import threading
+import time
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+
+
+@dataclass
+class WatchItem:
+    """Queued input file and its pre-decode status ('pending' | 'ready' | 'error' | 'opened')."""
+    path: Path
+    status: str = "pending"
+    error: str = ""
+    added: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        """Return a JSON-friendly view for the UI."""
+        return {"path": str(self.path), "name": self.path.name, "status": self.status, "error": self.error}
+
+
+class InputWatcher:
+    """Poll a folder for new images and pre-decode them on a background worker pool.
+
+    A file is queued only once its (size, mtime) is unchanged across two polls, so
+    partially synced files are not decoded early.
+    """
+
+    def __init__(
+        self,
+        input_dir: Path,
+        prepare: Callable[[Path], None],
+        interval: float = 1.0,
+        workers: Optional[int] = None,
+        include_existing: bool = False,
+    ):
+        """Initialize watcher for input_dir; prepare(path) does the decode/preview warm-up."""
+        self.input_dir = Path(input_dir)
+        self.prepare = prepare
+        self.interval = interval
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.include_existing = include_existing
+        self._items: Dict[Path, WatchItem] = {}
+        self._seen: Dict[Path, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        """Return True while the poll thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start polling and the worker pool (no-op if already running)."""
+        if self.running:
+            return
+        self.input_dir.mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        if not self.include_existing:
+            for path, sig in self._scan().items():
+                self._seen[path] = sig
+                self._items.setdefault(path, WatchItem(path, status="opened"))
+        self._thread = threading.Thread(target=self._run, name="input-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling; queued decodes are cancelled, running ones finish."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._thread = None
+        self._pool = None
+
+    def items(self) -> List[dict]:
+        """Return queued items not yet opened, oldest first."""
+        with self._lock:
+            queued = [it for it in self._items.values() if it.status != "opened"]
+        return [it.to_dict() for it in sorted(queued, key=lambda it: it.added)]
+
+    def mark_opened(self, path: Path) -> None:
+        """Drop a file from the review queue once the UI opens it."""
+        with self._lock:
+            item = self._items.get(Path(path).resolve())
+            if item:
+                item.status = "opened"
+
+    def _scan(self) -> Dict[Path, Tuple[int, float]]:
+        """Return {path: (size, mtime)} for image files directly inside input_dir."""
+        out: Dict[Path, Tuple[int, float]] = {}
+        try:
+            with os.scandir(self.input_dir) as it:
+                for e in it:
+                    if not e.is_file() or os.path.splitext(e.name)[1].lower() not in IMAGE_SUFFIXES:
+                        continue
+                    st = e.stat()
+                    out[Path(e.path).resolve()] = (st.st_size, st.st_mtime)
+        except OSError as e:
+            print(f"[watcher] scan failed: {e!r}")
+        return out
+
+    def _run(self) -> None:
+        """Poll until stopped, queueing files whose size/mtime have settled."""
+        pool = self._pool  # stop() may clear the attribute while this loop is finishing
+        while not self._stop.is_set():
+            current = self._scan()
+            for path, sig in current.items():
+                prev = self._seen.get(path)
+                self._seen[path] = sig
+                if prev != sig or sig[0] == 0:
+                    if prev is not None:
+                        with self._lock:
+                            # A rewritten file (e.g. a re-synced photo) is new content: queue it again once settled
+                            self._items.pop(path, None)
+                    continue
+                with self._lock:
+                    if path in self._items or self._stop.is_set():
+                        continue
+                    item = WatchItem(path)
+                    self._items[path] = item
+                try:
+                    pool.submit(self._prepare_one, item)
+                except RuntimeError:  # pool shut down by stop()
+                    with self._lock:
+                        self._items.pop(path, None)
+                    return
+            for gone in set(self._seen) - set(current):
+                self._seen.pop(gone, None)
+                with self._lock:
+                    self._items.pop(gone, None)
+            self._stop.wait(self.interval)
+
+    def _prepare_one(self, item: WatchItem) -> None:
+        """Run prepare() for one item and record the outcome."""
+        try:
+            self.prepare(item.path)
+            status, error = "ready", ""
+        except Exception as e:
+            status, error = "error", repr(e)
+        with self._lock:
+            if item.status == "pending":
+                item.status, item.error = status, error
+        print(f"[watcher] {item.path.name}: {status}{' ' + error if error else ''}")
+
+
+if __name__ == "__main__":
+    """Headless ingest: warm the disk cache for images arriving in ./input until Ctrl+C."""
+    from .api import CrossPrintAPI
+
+    api = CrossPrintAPI()
+    info = api.start_watch(include_existing=True)
+    print(f"[watcher] watching {info['input_dir']} with {info['workers']} workers (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        api.stop_watch()
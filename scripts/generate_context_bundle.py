@@ -2,13 +2,16 @@ from __future__ import annotations
 
 import fnmatch
 import hashlib
+import json
 import os
 import platform
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Iterable, List, Set, Tuple, Union
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 from zoneinfo import ZoneInfo
 
 def resolve_tz(tz_pref: str | None) -> timezone:
@@ -61,30 +64,60 @@ def human_size(n: int) -> str:
         s /= 1024.0
     return f"{n} B"
 
-def sha1_first8(path: Path) -> str:
-    """Return first 8 hex chars of SHA1."""
-    h = hashlib.sha1()
-    try:
-        with path.open('rb') as f:
-            for chunk in iter(lambda: f.read(1 << 15), b''):
-                h.update(chunk)
-        return h.hexdigest()[:8]
-    except Exception:
-        return "????????"
-
-def archive_existing_outputs(output_prefix: Path) -> None:
-    """Archive existing outputs matching stem into archive/."""
+def archive_existing_outputs(output_prefix: Path) -> Dict[Path, Path]:
+    """Archive existing outputs matching stem into archive/ and return {old: new} paths."""
     output_prefix.parent.mkdir(parents=True, exist_ok=True)
     archive_dir = output_prefix.parent / 'archive'
     archive_dir.mkdir(exist_ok=True)
+    moved: Dict[Path, Path] = {}
     for file_path in output_prefix.parent.glob(f"{output_prefix.stem}*.txt"):
         try:
             timestamp = get_timestamp()
             archived_name = f"{file_path.stem}_archived_{timestamp}.txt"
             file_path.rename(archive_dir / archived_name)
+            moved[file_path] = archive_dir / archived_name
             print(f"Archived: {file_path.name} → {archived_name}")
         except OSError as e:
             print(f"Failed to archive {file_path.name}: {e}")
+    return moved
+
+def manifest_path_for(output_prefix: Path) -> Path:
+    """Return the manifest path kept next to bundles for an output prefix."""
+    return output_prefix.with_name(f"{output_prefix.stem}_manifest.json")
+
+def load_manifest(path: Path, cap_bytes: Optional[int]) -> Dict[str, Dict]:
+    """Return manifest file entries, or {} if missing, unreadable, or built with another cap."""
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != 1 or data.get("cap_bytes") != cap_bytes:
+        return {}
+    return data.get("files", {})
+
+def save_manifest(path: Path, cap_bytes: Optional[int], entries: Dict[str, Dict]) -> None:
+    """Write manifest entries atomically."""
+    tmp = path.with_suffix('.json.tmp')
+    tmp.write_text(json.dumps({"version": 1, "cap_bytes": cap_bytes, "files": entries}, indent=1), encoding='utf-8')
+    os.replace(tmp, path)
+
+def read_bundle_slices(out_dir: Path, entries: Dict[str, Dict]) -> Dict[str, str]:
+    """Return {rel: text} read back from previous bundles at recorded byte offsets."""
+    by_bundle: Dict[str, List[Tuple[str, Dict]]] = {}
+    for rel, e in entries.items():
+        by_bundle.setdefault(e["bundle"], []).append((rel, e))
+    texts: Dict[str, str] = {}
+    for bundle, items in by_bundle.items():
+        try:
+            with (out_dir / bundle).open('rb') as f:
+                for rel, e in sorted(items, key=lambda it: it[1]["offset"]):
+                    f.seek(e["offset"])
+                    data = f.read(e["length"])
+                    if len(data) == e["length"]:
+                        texts[rel] = data.decode('utf-8')
+        except (OSError, UnicodeDecodeError):
+            continue
+    return texts
 
 
 def to_posix(rel: Path) -> str:
@@ -105,34 +138,45 @@ def match_any(patterns: Iterable[str], rel_posix: str) -> bool:
             return True
     return False
 
-def is_binary_file(path: Path, sniff_bytes: int = 2048) -> bool:
-    """Return True if file appears binary."""
+def looks_binary(chunk: bytes) -> bool:
+    """Return True if a leading chunk looks binary (NUL byte or invalid UTF-8)."""
+    if b'\x00' in chunk:
+        return True
     try:
-        with path.open('rb') as f:
-            chunk = f.read(sniff_bytes)
-        if b'\x00' in chunk:
-            return True
-        try:
-            chunk.decode('utf-8')
-            return False
-        except UnicodeDecodeError:
-            return True
-    except Exception:
+        chunk.decode('utf-8')
+        return False
+    except UnicodeDecodeError:
         return True
 
-def read_text_capped(path: Path, cap_bytes: int) -> Tuple[str, bool, int]:
-    """Return (text, truncated, actual_bytes) with UTF-8 replace and LF newlines."""
+def read_file_once(path: Path, cap_bytes: Optional[int], sniff_bytes: int = 2048) -> Dict:
+    """Return binary flag, capped LF text, size, and SHA1 prefix from a single streamed read.
+
+    The whole file is hashed, but only the first cap_bytes are kept as text.
+    """
     try:
-        size = path.stat().st_size
-        truncated = size > cap_bytes if cap_bytes is not None else False
-        read_len = min(size, cap_bytes) if cap_bytes is not None else size
         with path.open('rb') as f:
-            data = f.read(read_len)
-        text = data.decode('utf-8', errors='replace')
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
-        return text, truncated, size
-    except Exception as e:
-        return f"[Error reading {path}: {e}]\n", False, 0
+            head = f.read(sniff_bytes)
+            if looks_binary(head):
+                return {"binary": True}
+            h = hashlib.sha1(head)
+            kept = [head]
+            kept_len = len(head)
+            size = len(head)
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+                size += len(chunk)
+                if cap_bytes is None or kept_len < cap_bytes:
+                    kept.append(chunk)
+                    kept_len += len(chunk)
+    except Exception:
+        return {"binary": True}
+    data = b''.join(kept)
+    truncated = cap_bytes is not None and size > cap_bytes
+    if cap_bytes is not None:
+        data = data[:cap_bytes]
+    text = data.decode('utf-8', errors='replace')
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return {"binary": False, "text": text, "truncated": truncated, "size": size, "sha1": h.hexdigest()}
 
 def ensure_parents(paths: Set[Path], root: Path) -> Set[Path]:
     """Return set including parent dirs of given paths relative to root."""
@@ -201,12 +245,52 @@ def sort_paths(paths: Iterable[Path], root: Path) -> List[Path]:
         return [natural_key(part) for part in parts]
     return sorted(paths, key=key_func)
 
+def build_index(root: Path) -> List[Tuple[str, Path, bool]]:
+    """Return (rel_posix, path, is_dir) for every entry under root from one os.scandir walk."""
+    index: List[Tuple[str, Path, bool]] = []
+    stack = [(str(root), "")]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                for e in it:
+                    rel = f"{rel_dir}{e.name}"
+                    try:
+                        is_dir = e.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    index.append((rel, Path(e.path), is_dir))
+                    if is_dir:
+                        stack.append((e.path, rel + "/"))
+        except OSError:
+            continue
+    return index
+
+@lru_cache(maxsize=None)
+def compile_glob(pattern: str) -> "re.Pattern[str]":
+    """Return a compiled case-insensitive regex for a POSIX-style glob."""
+    return re.compile(fnmatch.translate(pattern.replace('\\', '/').lower()))
+
 def collect_targets(project_home: Path, includes: List[str], excludes: List[str], dir_depth: int = 1) -> Tuple[Set[Path], Set[Path]]:
-    """Return (files, dirs) selected by includes minus excludes."""
+    """Return (files, dirs) selected by includes minus excludes.
+
+    Glob specs are matched against a single tree index built on first need.
+    """
     include_patterns = [s.strip() for s in includes if s.strip()]
     exclude_patterns = [s.strip() for s in excludes if s.strip()]
     selected_files: Set[Path] = set()
     selected_dirs: Set[Path] = set()
+    index: Optional[List[Tuple[str, Path, bool]]] = None
+
+    def add_dir_with_children(dir_path: Path) -> None:
+        selected_dirs.add(dir_path)
+        for child in list_one_level(dir_path):
+            rel_child = to_posix(child.relative_to(project_home))
+            child_is_dir = child.is_dir()
+            if match_any(exclude_patterns, rel_child + ('/' if child_is_dir else '')):
+                continue
+            (selected_dirs if child_is_dir else selected_files).add(child)
+
     for spec in include_patterns:
         is_dir = is_dir_marker(spec)
         spec_clean = spec.rstrip('/\\')
@@ -216,38 +300,25 @@ def collect_targets(project_home: Path, includes: List[str], excludes: List[str]
             if abs_spec.is_dir():
                 if match_any(exclude_patterns, rel_posix + '/'):
                     continue
-                selected_dirs.add(abs_spec)
-                for child in list_one_level(abs_spec):
-                    rel_child = to_posix(child.relative_to(project_home))
-                    if match_any(exclude_patterns, rel_child + ('/' if child.is_dir() else '')):
-                        continue
-                    if child.is_dir():
-                        selected_dirs.add(child)
-                    else:
-                        selected_files.add(child)
+                add_dir_with_children(abs_spec)
         else:
             if abs_spec.exists():
                 target_set = selected_files if abs_spec.is_file() else selected_dirs
                 if not match_any(exclude_patterns, rel_posix + ('/' if abs_spec.is_dir() else '')):
                     target_set.add(abs_spec)
             else:
-                for p in project_home.rglob('*'):
-                    rel = to_posix(p.relative_to(project_home))
-                    if fnmatch.fnmatch(rel.lower(), spec_clean.replace('\\', '/').lower()):
-                        if match_any(exclude_patterns, rel + ('/' if p.is_dir() else '')):
-                            continue
-                        if p.is_dir():
-                            selected_dirs.add(p)
-                            for child in list_one_level(p):
-                                rel_child = to_posix(child.relative_to(project_home))
-                                if match_any(exclude_patterns, rel_child + ('/' if child.is_dir() else '')):
-                                    continue
-                                if child.is_dir():
-                                    selected_dirs.add(child)
-                                else:
-                                    selected_files.add(child)
-                        else:
-                            selected_files.add(p)
+                if index is None:
+                    index = build_index(project_home)
+                rx = compile_glob(spec_clean)
+                for rel, p, p_is_dir in index:
+                    if not rx.match(rel.lower()):
+                        continue
+                    if match_any(exclude_patterns, rel + ('/' if p_is_dir else '')):
+                        continue
+                    if p_is_dir:
+                        add_dir_with_children(p)
+                    else:
+                        selected_files.add(p)
     selected_files = {p.resolve() for p in selected_files if p.exists()}
     selected_dirs = {p.resolve() for p in selected_dirs if p.exists()}
     return selected_files, selected_dirs
@@ -270,36 +341,91 @@ def pull_imports(text: str) -> List[str]:
     return sorted(set(lines), key=str.lower)
 
 def write_bundle(project_home: Path, out_prefix: Path, files: List[Path], dirs: List[Path],
-                 cap_bytes: int, includes: List[str], excludes: List[str], tz_pref: str) -> Path:
-    """Write bundle file with tree, TOC, and concatenated contents."""
+                 cap_bytes: int, includes: List[str], excludes: List[str], tz_pref: str,
+                 incremental: bool = True, delta: bool = False) -> Path:
+    """Write bundle file with tree, TOC, and concatenated contents.
+
+    With incremental, files whose size/mtime match the manifest from the previous run are
+    taken from the previous bundle instead of re-read. With delta, only added/changed files
+    are written (plus a list of removed ones); the manifest still covers every file.
+    """
     out_prefix.parent.mkdir(parents=True, exist_ok=True)
-    archive_existing_outputs(out_prefix)
+    out_dir = out_prefix.parent
+    manifest_path = manifest_path_for(out_prefix)
+    prev_manifest = load_manifest(manifest_path, cap_bytes) if (incremental or delta) else {}
+    moved = archive_existing_outputs(out_prefix)
+    for e in prev_manifest.values():
+        if "bundle" in e:
+            new_loc = moved.get(out_dir / e["bundle"])
+            if new_loc is not None:
+                e["bundle"] = to_posix(new_loc.relative_to(out_dir))
 
     tzinfo = resolve_tz(tz_pref)
     ymd, hms, tz_abbr = timestamp_tokens(tzinfo)
-    out_file = out_prefix.with_name(f"{out_prefix.stem}_{ymd}_{hms}_{tz_abbr}").with_suffix(".txt")
+    suffix = "_delta" if delta else ""
+    out_file = out_prefix.with_name(f"{out_prefix.stem}{suffix}_{ymd}_{hms}_{tz_abbr}").with_suffix(".txt")
 
     file_infos: List[Dict] = []
     skipped_binary: List[str] = []
     truncated_list: List[str] = []
     total_text_bytes = 0
 
-
-    for p in files:
-        rel = to_posix(p.relative_to(project_home))
-        if is_binary_file(p):
+    # Split into files unchanged since the manifest (reusable) and files that need a read
+    rels = [to_posix(p.relative_to(project_home)) for p in files]
+    stats: Dict[str, Tuple[int, int]] = {}
+    reusable: Dict[str, Dict] = {}
+    for p, rel in zip(files, rels):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        stats[rel] = (st.st_size, st.st_mtime_ns)
+        prev = prev_manifest.get(rel)
+        if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+            reusable[rel] = prev
+    reused_texts = read_bundle_slices(out_dir, {r: e for r, e in reusable.items() if not e["binary"]})
+    reused = {r for r, e in reusable.items() if e["binary"] or r in reused_texts}
+    to_read = [p for p, rel in zip(files, rels) if rel not in reused]
+
+    # One streamed read per file (sniff + text + hash), overlapped on a thread pool
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 2)) as pool:
+        fresh = dict(zip(to_read, pool.map(lambda p: read_file_once(p, cap_bytes), to_read)))
+
+    manifest: Dict[str, Dict] = {}
+    for p, rel in zip(files, rels):
+        if rel in reused:
+            prev = reusable[rel]
+            r = dict(prev, text=reused_texts.get(rel, ""))
+        elif p in fresh:
+            r = fresh[p]
+        else:
+            continue
+        size, mtime_ns = stats.get(rel, (r.get("size", 0), 0))
+        entry = {"size": size, "mtime_ns": mtime_ns, "binary": r["binary"]}
+        if not r["binary"]:
+            entry.update(sha1=r["sha1"], truncated=r["truncated"])
+            if rel in reused:
+                entry.update(bundle=prev["bundle"], offset=prev["offset"], length=prev["length"])
+        manifest[rel] = entry
+        if delta and rel in reused:
+            continue
+        if r["binary"]:
             skipped_binary.append(rel)
             continue
-        text, was_truncated, actual_size = read_text_capped(p, cap_bytes)
-        h = sha1_first8(p)
+        text = r["text"]
         imports = pull_imports(text) if p.suffix.lower() == '.py' else []
         total_text_bytes += len(text.encode('utf-8', errors='replace'))
-        if was_truncated:
+        if r["truncated"]:
             truncated_list.append(rel)
         file_infos.append({
-            "path": p, "rel": rel, "size": actual_size, "text": text,
-            "truncated": was_truncated, "hash8": h, "imports": imports
+            "path": p, "rel": rel, "size": r["size"], "text": text,
+            "truncated": r["truncated"], "hash8": r["sha1"][:8], "imports": imports
         })
+    added = sorted(r for r in manifest if r not in prev_manifest)
+    changed = sorted(r for r in manifest if r in prev_manifest and r not in reused)
+    removed = sorted(r for r in prev_manifest if r not in manifest)
+    if delta:
+        dirs = []
     roots: Set[Path] = set(dirs)
     for fi in file_infos:
         roots.add(fi["path"].parent)
@@ -320,6 +446,16 @@ def write_bundle(project_home: Path, out_prefix: Path, files: List[Path], dirs:
         f.write(f"  Script: {Path(__file__).resolve()}\n")
         f.write(f"  Glob match: case-insensitive\n")
         f.write(format_inclusions(includes, excludes, cap_bytes))
+        if prev_manifest:
+            f.write(f"Incremental: {len(reused)} unchanged reused, {len(added)} added, "
+                    f"{len(changed)} changed, {len(removed)} removed\n")
+        if delta:
+            f.write("Delta bundle: only added/changed files are included below.\n")
+            for label, items in (("Added", added), ("Changed", changed), ("Removed", removed)):
+                if items:
+                    f.write(f"  {label}:\n")
+                    for item in items:
+                        f.write(f"    - {item}\n")
         f.write("\n")
 
         f.write("Targeted Tree:\n")
@@ -353,7 +489,10 @@ def write_bundle(project_home: Path, out_prefix: Path, files: List[Path], dirs:
             size_str = human_size(fi["size"])
             trunc_note = f", truncated @ {human_size(cap_bytes)}" if fi["truncated"] else ""
             f.write(f"===== BEGIN: {fi['rel']} ({size_str}, sha1={fi['hash8']}{trunc_note}) =====\n")
+            start = f.tell()  # byte offset: UTF-8 text mode has no decoder state to encode
             f.write(fi["text"])
+            m = manifest[fi["rel"]]
+            m.update(bundle=out_file.name, offset=start, length=f.tell() - start)
             f.write("\n===== END: {0} =====\n\n".format(fi['rel']))
         f.write("Summary:\n")
         f.write(f"  Files included: {len(file_infos)}\n")
@@ -368,6 +507,8 @@ def write_bundle(project_home: Path, out_prefix: Path, files: List[Path], dirs:
             f.write("  Truncated:\n")
             for t in truncated_list:
                 f.write(f"    - {t}\n")
+    if incremental or delta:
+        save_manifest(manifest_path, cap_bytes, manifest)
     return out_file
 
 if __name__ == "__main__":
@@ -397,11 +538,14 @@ if __name__ == "__main__":
 
     max_file_bytes = 1_000_000
     time_zone = "local"  # "UTC", "local", or IANA like "America/Denver"
+    incremental = True   # reuse unchanged files from the previous bundle via the manifest
+    delta_only = "--delta" in sys.argv[1:]  # write only added/changed files
 
     files_set, dirs_set = collect_targets(project_home, includes, excludes, dir_depth=1)
     files = sort_paths(files_set, project_home)
     dirs = sort_paths(dirs_set, project_home)
     print(format_inclusions(includes, excludes, max_file_bytes), end="")
-    out_path = write_bundle(project_home, output_prefix, files, dirs, max_file_bytes, includes, excludes, time_zone)
+    out_path = write_bundle(project_home, output_prefix, files, dirs, max_file_bytes, includes, excludes, time_zone,
+                            incremental=incremental, delta=delta_only)
     print(f"Wrote: {out_path}")
 
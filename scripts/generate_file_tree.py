@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import json
+import os
 import re
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Dict, Tuple, Union
+from typing import IO, Iterator, List, Dict, Optional, Tuple, Union
+
+_LEADING_NUMBER = re.compile(r'^(\d+)')
 
 def get_timestamp() -> str:
     """Return UTC timestamp as yymmddZHHMMSS."""
@@ -11,40 +15,102 @@ def get_timestamp() -> str:
 
 def extract_number(entry: str) -> Union[int, float]:
     """Return leading integer or inf for natural sort."""
-    match = re.match(r'^(\d+)', entry)
+    match = _LEADING_NUMBER.match(entry)
     return int(match.group(1)) if match else float('inf')
 
 def archive_existing_file_trees(output_prefix: Path) -> None:
-    """Archive existing tree files matching stem into archive/."""
+    """Archive existing tree files (.txt/.json) matching stem into archive/."""
     output_prefix.parent.mkdir(parents=True, exist_ok=True)
     archive_dir = output_prefix.parent / 'archive'
     archive_dir.mkdir(exist_ok=True)
-    for file_path in output_prefix.parent.glob(f"{output_prefix.stem}*.txt"):
-        try:
-            timestamp = get_timestamp()
-            archived_name = f"{file_path.stem}_archived_{timestamp}.txt"
-            archived_path = archive_dir / archived_name
-            file_path.rename(archived_path)
-            print(f"Archived: {file_path.name} → {archived_path.name}")
-        except OSError as e:
-            print(f"Failed to archive {file_path.name}: {e}")
+    for ext in ('.txt', '.json'):
+        for file_path in output_prefix.parent.glob(f"{output_prefix.stem}*{ext}"):
+            try:
+                timestamp = get_timestamp()
+                archived_name = f"{file_path.stem}_archived_{timestamp}{ext}"
+                archived_path = archive_dir / archived_name
+                file_path.rename(archived_path)
+                print(f"Archived: {file_path.name} → {archived_path.name}")
+            except OSError as e:
+                print(f"Failed to archive {file_path.name}: {e}")
 
 class ExclusionFilter:
-    """Callable filter for prefixes, suffixes, filetypes, and folders."""
+    """Callable filter for prefixes, suffixes, filetypes, and folders, compiled to one regex."""
     def __init__(self, prefixes: List[str], suffixes: List[str], filetypes: List[str], folders: List[str]):
         self.prefixes = prefixes
         self.suffixes = suffixes
         self.filetypes = {ftype.lstrip('.').lower() for ftype in filetypes}
         self.folders = set(folders)
+        alternatives = []
+        if prefixes:
+            alternatives.append(r'\A(?:' + '|'.join(map(re.escape, prefixes)) + ')')
+        if suffixes:
+            alternatives.append('(?:' + '|'.join(map(re.escape, suffixes)) + r')\Z')
+        # Path.suffix semantics: last '.'-part, not a leading dot, so dotted filetypes never match
+        plain_types = sorted(t for t in self.filetypes if t and '.' not in t)
+        if plain_types:
+            alternatives.append(r'(?<=.)\.(?i:' + '|'.join(map(re.escape, plain_types)) + r')\Z')
+        if self.folders:
+            alternatives.append(r'\A(?:' + '|'.join(map(re.escape, sorted(self.folders))) + r')\Z')
+        self._pattern = re.compile('|'.join(alternatives), re.DOTALL) if alternatives else None
+
+    def matches(self, name: str) -> bool:
+        """Return True if an entry with this name should be excluded."""
+        return self._pattern is not None and self._pattern.search(name) is not None
 
     def __call__(self, entry: Path) -> bool:
         """Return True if entry should be excluded."""
-        return (
-            any(entry.name.startswith(prefix) for prefix in self.prefixes) or
-            any(entry.name.endswith(suffix) for suffix in self.suffixes) or
-            entry.suffix.lstrip('.').lower() in self.filetypes or
-            entry.name in self.folders
-        )
+        return self.matches(entry.name)
+
+def iter_tree(root: Path, exclude_filter: ExclusionFilter, with_size: bool = False) -> Iterator[Tuple]:
+    """Yield walk events depth-first with os.scandir, pruning excluded entries before descending.
+
+    Events: ('dir', name, prefix, is_last), ('file', name, prefix, is_last, size | None),
+    ('end', ) after a directory's children, and ('error', message, prefix).
+    Only one directory listing per tree level is held in memory.
+    """
+    def listing(path: str, prefix: str) -> Iterator[Tuple]:
+        try:
+            with os.scandir(path) as it:
+                entries = [e for e in it if not exclude_filter.matches(e.name)]
+        except PermissionError:
+            yield ('error', f"[Permission Denied: {path}]", prefix)
+            return
+        except Exception as e:
+            yield ('error', f"[Error accessing {path}: {e}]", prefix)
+            return
+        entries.sort(key=lambda e: (extract_number(e.name), e.name))
+        last = len(entries) - 1
+        for i, e in enumerate(entries):
+            yield ('entry', e, prefix, i == last)
+
+    stack = [listing(str(root), "")]
+    while stack:
+        event = next(stack[-1], None)
+        if event is None:
+            stack.pop()
+            if stack:
+                yield ('end',)
+            continue
+        if event[0] == 'error':
+            yield event
+            continue
+        _, e, prefix, is_last = event
+        try:
+            is_dir = e.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            yield ('dir', e.name, prefix, is_last)
+            stack.append(listing(e.path, prefix + ("    " if is_last else "│   ")))
+        else:
+            size = None
+            if with_size:
+                try:
+                    size = e.stat().st_size
+                except OSError:
+                    pass
+            yield ('file', e.name, prefix, is_last, size)
 
 def format_exclusions(exclude_config: Dict[str, List[str]]) -> str:
     """Return human-readable exclusions block."""
@@ -58,9 +124,10 @@ def generate_file_tree(
     target_path: Path,
     output_path: Path,
     exclude_config: Dict[str, List[str]],
-    archive_previous: bool = True
+    archive_previous: bool = True,
+    json_output: bool = False,
 ) -> None:
-    """Write a timestamped tree snapshot to disk."""
+    """Write a timestamped tree snapshot to disk (and optionally a nested JSON twin)."""
     exclude_filter = ExclusionFilter(
         exclude_config.get("prefixes", []),
         exclude_config.get("suffixes", []),
@@ -72,36 +139,53 @@ def generate_file_tree(
     timestamp = get_timestamp()
     output_base = output_path.with_suffix('')
     output_file = f"{output_base}_{timestamp}.txt"
+    json_file = f"{output_base}_{timestamp}.json" if json_output else None
     file_count = 0
     folder_count = 0
-    with open(output_file, 'w', encoding='utf-8') as file:
-        file.write(f"Target Path: {target_path.resolve()}\n")
-        file.write(f"Output Path: {Path(output_file).resolve()}\n\n")
-        file.write(f"{target_path.name}/\n")
-        def walk_directory(current_path: Path, prefix: str = "") -> Tuple[int, int]:
-            nonlocal file_count, folder_count
-            try:
-                entries = sorted(current_path.iterdir(), key=lambda e: (extract_number(e.name), e.name))
-                entries = [e for e in entries if not exclude_filter(e)]
-                for i, entry in enumerate(entries):
-                    connector = "└──" if i == len(entries) - 1 else "├──"
-                    line = f"{prefix}{connector} {entry.name}"
-                    if entry.is_dir():
-                        file.write(line + "/\n")
-                        folder_count += 1
-                        new_prefix = prefix + ("    " if connector == "└──" else "│   ")
-                        walk_directory(entry, new_prefix)
-                    else:
-                        file.write(line + "\n")
-                        file_count += 1
-            except PermissionError:
-                file.write(f"{prefix}└── [Permission Denied: {current_path}]\n")
-            except Exception as e:
-                file.write(f"{prefix}└── [Error accessing {current_path}: {e}]\n")
-            return file_count, folder_count
-        walk_directory(target_path)
-        file.write("\n" + format_exclusions(exclude_config))
-        file.write(f"\nSummary:\n  Folders: {folder_count}\n  Files: {file_count}\n")
+    with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as file:
+        jf: Optional[IO[str]] = open(json_file, 'w', encoding='utf-8', buffering=1 << 20) if json_file else None
+        try:
+            file.write(f"Target Path: {target_path.resolve()}\n")
+            file.write(f"Output Path: {Path(output_file).resolve()}\n\n")
+            file.write(f"{target_path.name}/\n")
+            if jf:
+                jf.write('{"target": %s, "root": {"name": %s, "type": "dir", "children": ['
+                         % (json.dumps(str(target_path.resolve())), json.dumps(target_path.name)))
+            need_comma = False  # JSON: whether the current children list already has an item
+            for event in iter_tree(target_path, exclude_filter, with_size=jf is not None):
+                kind = event[0]
+                if kind == 'dir':
+                    _, name, prefix, is_last = event
+                    file.write(f"{prefix}{'└──' if is_last else '├──'} {name}/\n")
+                    folder_count += 1
+                    if jf:
+                        jf.write('%s{"name": %s, "type": "dir", "children": [' % (',' if need_comma else '', json.dumps(name)))
+                        need_comma = False
+                elif kind == 'file':
+                    _, name, prefix, is_last, size = event
+                    file.write(f"{prefix}{'└──' if is_last else '├──'} {name}\n")
+                    file_count += 1
+                    if jf:
+                        jf.write('%s{"name": %s, "type": "file", "size": %s}' % (',' if need_comma else '', json.dumps(name), json.dumps(size)))
+                        need_comma = True
+                elif kind == 'end':
+                    if jf:
+                        jf.write(']}')
+                        need_comma = True
+                else:
+                    _, message, prefix = event
+                    file.write(f"{prefix}└── {message}\n")
+                    if jf:
+                        jf.write('%s{"error": %s}' % (',' if need_comma else '', json.dumps(message)))
+                        need_comma = True
+            file.write("\n" + format_exclusions(exclude_config))
+            file.write(f"\nSummary:\n  Folders: {folder_count}\n  Files: {file_count}\n")
+            if jf:
+                jf.write(']}, "exclusions": %s, "summary": {"folders": %d, "files": %d}}\n'
+                         % (json.dumps(exclude_config), folder_count, file_count))
+        finally:
+            if jf:
+                jf.close()
 
 if __name__ == "__main__":
     """Resolve project_home and run with defaults."""
@@ -116,4 +200,5 @@ if __name__ == "__main__":
         "filetypes": ["pyc", "log"],
         "folders": ['.git', '.venv', 'venv', '__pycache__', 'logs', '.pytest_cache', 'archive', '.DS_Store', 'build']
     }
-    generate_file_tree(target_path, output_dir / 'file_tree', exclude_config)
+    json_output = False  # also write a nested JSON snapshot next to the .txt
+    generate_file_tree(target_path, output_dir / 'file_tree', exclude_config, json_output=json_output)
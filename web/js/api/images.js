@@ -57,15 +57,44 @@ export async function loadImage(path) {
     return await call('load_image', path);
 }
 
+export async function startWatch(includeExisting = false) {
+    // returns { input_dir, workers }
+    return await call('start_watch', includeExisting);
+}
+
+export async function stopWatch() {
+    return await call('stop_watch');
+}
+
+export async function getWatchQueue() {
+    // returns { watching, items: [{ path, name, status, error }] }
+    return await call('get_watch_queue');
+}
+
 export async function getPreviewPng(imageId) {
     // returns data URL (string)
     return await call('get_preview_png', imageId);
 }
 
+export async function getPyramidInfo(imageId) {
+    // returns { full_width, full_height, scale, tile_size, levels: [{ width, height, cols, rows }] }
+    return await call('get_pyramid_info', imageId);
+}
+
+export async function getTilePng(imageId, level, col, row) {
+    // returns data URL (string) for one pyramid tile
+    return await call('get_tile_png', imageId, level, col, row);
+}
+
 export async function applyHomography(imageId, anchors) {
     return await call('apply_homography', imageId, anchors);
 }
 
+export async function applySquareWarp(imageId, anchors, { dpi, sizeIn, resample } = {}) {
+    // Warp the quad straight into a dpi*sizeIn square (native size if either is missing)
+    return await call('apply_square_warp', imageId, anchors, null, dpi ?? null, sizeIn ?? null, resample || 'area');
+}
+
 export async function applyCrop(imageId, crop) {
     return await call('apply_crop', imageId, crop);
 }
@@ -75,6 +104,16 @@ export async function applyThreshold(imageId, mode, value) {
     return await call('apply_threshold', imageId, mode, value);
 }
 
+export async function closeImage(imageId) {
+    // frees the backend image (and its shared-memory buffer)
+    return await call('close_image', imageId);
+}
+
+export async function thresholdSweep(imageId, values = null, includeVariants = true) {
+    // returns { width, height, otsu, thumbs: [{ method, value, ink, png }] }
+    return await call('threshold_sweep', imageId, values, includeVariants);
+}
+
 export async function exportImage(imageId, outDir) {
     // returns { path }
     return await call('export_image', imageId, outDir);
@@ -3,6 +3,7 @@
 
 import { setStatus } from './ui/status.js';
 import { enableAfterLoad, wireCropInputs, wireResetCrop } from './ui/panels.js';
+import { showIncoming, renderIncoming } from './ui/incoming.js';
 
 import {
     getState,
@@ -116,6 +117,9 @@ function wireUI() {
     // Export (non-blocking)
     document.querySelector('#btn-export').addEventListener('click', onExport);
 
+    // Watch input/ for new images (pre-decoded in the background)
+    document.querySelector('#btn-watch').addEventListener('click', onToggleWatch);
+
     // Canvas interactions
     wireCanvasInteractions();
 
@@ -142,6 +146,34 @@ async function onOpen() {
     await openFromSource({ path, displayName: path.split(/[\\/]/).pop() || 'image' });
 }
 
+// ----- Watch mode -----
+const WATCH_POLL_MS = 2000;
+let watchTimer = 0;
+
+async function onToggleWatch() {
+    const btn = document.querySelector('#btn-watch');
+    if (watchTimer) {
+        clearInterval(watchTimer);
+        watchTimer = 0;
+        await API.stopWatch();
+        showIncoming(false);
+        btn.textContent = 'Watch input/';
+        setStatus('Stopped watching input/');
+        return;
+    }
+    const info = await API.startWatch(false);
+    btn.textContent = 'Stop watching';
+    showIncoming(true);
+    setStatus(`Watching ${info.input_dir}`);
+    await pollWatchQueue();
+    watchTimer = setInterval(pollWatchQueue, WATCH_POLL_MS);
+}
+
+async function pollWatchQueue() {
+    const { items } = await API.getWatchQueue();
+    renderIncoming(items, (it)=>openFromSource({ path: it.path, displayName: it.name }));
+}
+
 async function onExport() {
     const out = 'output';
     setStatus('Exporting...');
@@ -176,6 +208,10 @@ async function openFromSource({ path, file, displayName }) {
         return;
     }
 
+    // Release the previous backend image now that the new one is registered
+    const prevId = getState().imageId;
+    if (prevId != null && prevId !== info.image_id) API.closeImage(prevId).catch(console.error);
+
     setImageId(info.image_id);
     setCheckpoint(info.image_id);
     setWorking(info.image_id);
@@ -198,6 +234,7 @@ async function openFromSource({ path, file, displayName }) {
     fitToScreen();
     enableAfterLoad();
     setStatus(`Image loaded${(displayName || file?.name) ? ': ' + (displayName || file?.name) : ''}`);
+    if (watchTimer) pollWatchQueue();   // drop the opened file from the incoming list
     scheduleRender();
 }
 
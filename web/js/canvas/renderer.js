@@ -2,6 +2,7 @@
 import { getState } from '../data/state.js';
 import { toCanvas } from './viewport.js';
 import { ANCHOR_R } from '../data/constants.js';
+import { drawTiles, setTileReadyHandler } from './tiles.js';
 
 const canvas = document.querySelector('#stage');
 const ctx = canvas.getContext('2d');
@@ -26,6 +27,9 @@ export function scheduleRender() {
     });
 }
 
+// Re-render when a full-res tile arrives
+setTileReadyHandler(() => scheduleRender());
+
 function drawCrosshair(x, y) {
     const { panX, panY, zoom } = getState();
     ctx.save();
@@ -120,6 +124,8 @@ export async function render() {
         if (bmp) ctx.drawImage(bmp, panX, panY, imgW * zoom, imgH * zoom);
     } else if (imageBitmap) {
         ctx.drawImage(imageBitmap, panX, panY, imgW * zoom, imgH * zoom);
+        // Sharper full-res tiles over the preview once zoomed in past it
+        drawTiles(ctx);
     }
 
     if (mode === 'anchors') renderAnchors();
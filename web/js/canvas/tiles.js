@@ -0,0 +1,101 @@
+// web/js/canvas/tiles.js
+// Zoom-dependent full-res tiles drawn over the preview when zoomed in past it.
+import { getState } from '../data/state.js';
+import { getPyramidInfo, getTilePng } from '../api/images.js';
+import { toCanvas, visibleImageRect, pyramidLevelForZoom } from './viewport.js';
+
+const MAX_CACHED_TILES = 192;
+const MAX_IN_FLIGHT = 3;
+
+// Cache is tied to the current preview bitmap; any backend op replaces it.
+let source = { bitmap: null, imageId: null, info: null, infoPending: false };
+const cache = new Map();     // key "level/col/row" -> ImageBitmap (insertion order = LRU)
+const inFlight = new Set();
+let wanted = [];             // keys visible at last draw, nearest-first
+let onTileReady = () => {};
+
+export function setTileReadyHandler(fn) { onTileReady = fn; }
+
+function resetFor(bitmap, imageId) {
+    source = { bitmap, imageId, info: null, infoPending: false };
+    cache.clear();
+    wanted = [];
+}
+
+function ensureInfo() {
+    const { imageBitmap, imageId } = getState();
+    if (source.bitmap !== imageBitmap || source.imageId !== imageId) resetFor(imageBitmap, imageId);
+    if (source.info || source.infoPending || !imageId) return source.info;
+    source.infoPending = true;
+    const mine = source;
+    getPyramidInfo(imageId).then((info)=>{
+        if (mine !== source) return;
+        source.info = info;
+        onTileReady();
+    }).catch((e)=>{
+        console.error(e);
+    }).finally(()=>{ mine.infoPending = false; });
+    return null;
+}
+
+function pump() {
+    while (inFlight.size < MAX_IN_FLIGHT && wanted.length) {
+        const key = wanted.shift();
+        if (cache.has(key) || inFlight.has(key)) continue;
+        const [level, col, row] = key.split('/').map(Number);
+        const mine = source;
+        inFlight.add(key);
+        getTilePng(mine.imageId, level, col, row)
+            .then(loadBitmap)
+            .then((bmp)=>{
+                if (mine !== source) return;
+                cache.set(key, bmp);
+                while (cache.size > MAX_CACHED_TILES) cache.delete(cache.keys().next().value);
+                onTileReady();
+            })
+            .catch((e)=>console.error(e))
+            .finally(()=>{ inFlight.delete(key); pump(); });
+    }
+}
+
+// Draw cached tiles for the visible region and queue any that are missing.
+export function drawTiles(ctx) {
+    const info = ensureInfo();
+    if (!info) return;
+    const { imgW, imgH, zoom } = getState();
+    const level = pyramidLevelForZoom(info.scale, info.levels.length);
+    if (level === null) { wanted = []; return; }
+
+    const lv = info.levels[level];
+    const T = info.tile_size;
+    const fx = imgW / lv.width, fy = imgH / lv.height;   // preview px per level px
+    const vis = visibleImageRect();
+    const c0 = Math.max(0, Math.floor(vis.left / (T * fx)));
+    const c1 = Math.min(lv.cols - 1, Math.floor(vis.right / (T * fx)));
+    const r0 = Math.max(0, Math.floor(vis.top / (T * fy)));
+    const r1 = Math.min(lv.rows - 1, Math.floor(vis.bottom / (T * fy)));
+
+    const missing = [];
+    const cx = (c0 + c1) / 2, cy = (r0 + r1) / 2;
+    for (let row = r0; row <= r1; row++) {
+        for (let col = c0; col <= c1; col++) {
+            const key = `${level}/${col}/${row}`;
+            const bmp = cache.get(key);
+            if (!bmp) { missing.push({ key, d: Math.hypot(col - cx, row - cy) }); continue; }
+            cache.delete(key); cache.set(key, bmp);    // refresh LRU position
+            const p = toCanvas({ x: col * T * fx, y: row * T * fy });
+            ctx.drawImage(bmp, p.x, p.y, bmp.width * fx * zoom, bmp.height * fy * zoom);
+        }
+    }
+    wanted = missing.sort((a, b)=>a.d - b.d).map(m => m.key);
+    pump();
+}
+
+function loadBitmap(url) {
+    return new Promise((res, rej)=>{
+        const img = new Image();
+        img.onload = ()=>res(img);
+        img.onerror = rej;
+        img.src = url;
+    }).then(img => createImageBitmap(img));
+}
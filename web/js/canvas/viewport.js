@@ -44,6 +44,30 @@ export function zoomAtScreenPoint(deltaY, screenPoint) {
     setViewport({ panX: panX + mx - after.x, panY: panY + my - after.y });
 }
 
+// Visible region of the image in preview/image space, clamped to image bounds
+export function visibleImageRect() {
+    const { imgW, imgH } = getState();
+    const tl = fromCanvas({ x: 0, y: 0 });
+    const br = fromCanvas({ x: wrap.clientWidth, y: wrap.clientHeight });
+    return {
+        left:   Math.max(0, tl.x),
+        top:    Math.max(0, tl.y),
+        right:  Math.min(imgW, br.x),
+        bottom: Math.min(imgH, br.y),
+    };
+}
+
+// Pyramid level (0 = full-res) whose resolution just covers the current zoom.
+// Returns null when the preview itself is already sharp enough.
+export function pyramidLevelForZoom(previewScale, levelCount) {
+    const { zoom } = getState();
+    const screenPerFull = zoom * previewScale;   // screen px per full-res px
+    if (screenPerFull <= previewScale) return null;
+    const level = Math.floor(-Math.log2(screenPerFull));
+    const clamped = Math.max(0, Math.min(levelCount - 1, level));
+    return Math.pow(2, -clamped) > previewScale ? clamped : null;
+}
+
 export function panBy(dx, dy) {
     const { panX, panY } = getState();
     setViewport({ panX: panX + dx, panY: panY + dy });
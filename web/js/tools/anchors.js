@@ -1,6 +1,6 @@
 // web/js/tools/anchors.js
 import { getState, setMode, setAnchors, updateAnchor, pushAnchor, setImageBitmap } from '../data/state.js';
-import { applyHomography, getPreviewPng } from '../api/images.js';
+import { applyHomography, applySquareWarp, getPreviewPng } from '../api/images.js';
 import { scheduleRender } from '../canvas/renderer.js';
 import { toCanvas, fromCanvas, fitToScreen } from '../canvas/viewport.js';
 import { ANCHOR_R } from '../data/constants.js';
@@ -8,14 +8,32 @@ import { setStatus } from '../ui/status.js';
 import { showAnchorsPanel } from '../ui/panels.js';
 
 const canvas = document.querySelector('#stage');
+const squareToggle = document.querySelector('#warp-square');
+const squareOpts = document.querySelector('#warp-square-opts');
 let dragAnchor = null;
 
+squareToggle?.addEventListener('change', ()=>{
+    squareOpts?.classList.toggle('hidden', !squareToggle.checked);
+});
+
 export function enter() {
     setMode('anchors');
     showAnchorsPanel();
     scheduleRender();
 }
 
+// Square-warp options from the panel (null when warping the full canvas)
+function squareWarpOptions() {
+    if (!squareToggle?.checked) return null;
+    const dpi = parseFloat(document.querySelector('#warp-dpi').value);
+    const sizeIn = parseFloat(document.querySelector('#warp-size').value);
+    return {
+        dpi: dpi > 0 ? dpi : null,
+        sizeIn: sizeIn > 0 ? sizeIn : null,
+        resample: document.querySelector('#warp-resample').value,
+    };
+}
+
 export function onLeftDown(e) {
     if (!getState().imageBitmap) return; // ignore if no image yet
     const rect = canvas.getBoundingClientRect();
@@ -49,7 +67,9 @@ export async function apply() {
     const { imageId, anchors } = getState();
     if (!imageId || anchors.length !== 4) return;
     setStatus('Applying perspective...');
-    await applyHomography(imageId, anchors);
+    const square = squareWarpOptions();
+    if (square) await applySquareWarp(imageId, anchors, square);
+    else await applyHomography(imageId, anchors);
     const dataUrl = await getPreviewPng(imageId);
     await updatePreviewFromDataUrl(dataUrl);
     setAnchors([]);
@@ -7,7 +7,7 @@ import {
     setThresholdPreviewValue,
 } from '../data/state.js';
 import { getCheckpoint, getWorking, APPLY_THRESHOLD_FROM_CHECKPOINT } from '../data/history.js';
-import { applyThreshold, getPreviewPng } from '../api/images.js';
+import { applyThreshold, getPreviewPng, thresholdSweep } from '../api/images.js';
 import { scheduleRender } from '../canvas/renderer.js';
 import { showThresholdPanel } from '../ui/panels.js';
 import { setStatus } from '../ui/status.js';
@@ -52,14 +52,59 @@ export function wireControls() {
         scheduleRender();
     });
 
+    // Sweep: one backend call returns thumbnails for many values + Otsu/adaptive
+    document.querySelector('#btn-sweep')?.addEventListener('click', runSweep);
+
     // Apply commits the current slider value, then clears preview
     document.querySelector('#apply-threshold').addEventListener('click', applyManual);
 }
 
-async function applyManual() {
-    const srcId = APPLY_THRESHOLD_FROM_CHECKPOINT
+function thresholdSourceId() {
+    return APPLY_THRESHOLD_FROM_CHECKPOINT
     ? (getCheckpoint() ?? getState().imageId)
     : (getWorking() ?? getState().imageId);
+}
+
+async function runSweep() {
+    const srcId = thresholdSourceId();
+    const grid = document.querySelector('#thr-sweep');
+    if (!srcId || !grid) return;
+    setStatus('Computing threshold sweep...');
+    const res = await thresholdSweep(srcId);
+    grid.replaceChildren(...res.thumbs.map(t => {
+        const fig = document.createElement('figure');
+        const img = document.createElement('img');
+        img.src = t.png;
+        const cap = document.createElement('figcaption');
+        const name = t.method === 'global' ? String(t.value) : `${t.method}${t.value != null ? ' ' + t.value : ''}`;
+        cap.textContent = `${name} · ${Math.round(t.ink * 100)}% ink`;
+        fig.append(img, cap);
+        fig.addEventListener('click', ()=>pickSweep(srcId, t));
+        return fig;
+    }));
+    setStatus(`Sweep ready (Otsu ${res.otsu})`);
+}
+
+async function pickSweep(srcId, t) {
+    if (t.method === 'adaptive') {
+        // Not expressible as a single slider value: commit it directly
+        setStatus('Applying adaptive threshold...');
+        await applyThreshold(srcId, 'adaptive', 0);
+        await refreshPreview(srcId, 'Adaptive threshold applied');
+        setThresholdPreviewValue(null);
+        scheduleRender();
+        return;
+    }
+    thr.value = String(t.value);
+    thrVal.textContent = String(t.value);
+    setThresholdUIValue(t.value);
+    setThresholdPreviewValue(t.value);   // live preview only
+    setStatus(`Threshold: ${t.value}`);
+    scheduleRender();
+}
+
+async function applyManual() {
+    const srcId = thresholdSourceId();
     if (!srcId) return;
     const v = parseInt(thr.value, 10) | 0;
 
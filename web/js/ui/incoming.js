@@ -0,0 +1,33 @@
+// web/js/ui/incoming.js
+// Watch-mode queue: lists files arriving in input/ and opens them on click.
+const panel = document.querySelector('#panel-incoming');
+const list = document.querySelector('#incoming-list');
+
+export function showIncoming(visible) {
+    panel?.classList.toggle('hidden', !visible);
+}
+
+export function renderIncoming(items, onPick) {
+    if (!list) return;
+    list.replaceChildren(...items.map(it => {
+        const li = document.createElement('li');
+        li.className = it.status;
+        li.title = it.error || it.path;
+
+        const name = document.createElement('span');
+        name.textContent = it.name;
+        const state = document.createElement('span');
+        state.className = 'state';
+        state.textContent = it.status === 'pending' ? 'warming…' : it.status;
+
+        li.append(name, state);
+        if (it.status !== 'error') li.addEventListener('click', () => onPick(it));
+        return li;
+    }));
+    if (!items.length) {
+        const li = document.createElement('li');
+        li.className = 'empty';
+        li.textContent = 'Waiting for new images…';
+        list.appendChild(li);
+    }
+}